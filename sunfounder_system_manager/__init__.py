@@ -1,4 +1,8 @@
-from sunfounder_service_node.service_node import create_luancher
-from .system_manager import SystemManager
+from .main import main
 
-main = create_luancher(SystemManager, "system_manager", "SunFounder System manager")
+def __getattr__(name):
+    # Imported lazily so the status command doesn't load the daemon
+    if name == "SystemManager":
+        from .system_manager import SystemManager
+        return SystemManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,236 @@
+import operator
+import re
+import time
+from fnmatch import fnmatch
+
+from .exporter import ENTITY_LISTS
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Operator whose result is the reverse of each, used for hysteresis
+RESOLVE_OPERATORS = {
+    '>': operator.le,
+    '>=': operator.lt,
+    '<': operator.ge,
+    '<=': operator.gt,
+    '==': operator.ne,
+    '!=': operator.eq,
+}
+
+class Rule():
+    """
+    Compiled alert rule
+
+    Rule config:
+        name (str): Alert name
+        metric (str): Metric key, fnmatch patterns like "disk_*_percent" allowed
+        op (str): Comparison operator, one of > >= < <= == !=
+        value (float): Threshold
+        rate (bool): Compare the rate of change per second instead of the value
+        for (float): Seconds the condition must hold before firing
+        clear (float): Threshold the value must cross back to resolve, defaults to value
+        severity (str): Free form severity, passed along with alerts
+    """
+
+    def __init__(self, config):
+        self.name = config["name"]
+        self.metric = config["metric"]
+        self.op = config.get("op", ">")
+        if self.op not in OPERATORS:
+            raise ValueError(f"Invalid operator in rule {self.name}: {self.op}")
+        self.value = float(config["value"])
+        self.clear = float(config.get("clear", self.value))
+        self.rate = bool(config.get("rate", False))
+        self.duration = float(config.get("for", 0))
+        self.severity = config.get("severity", "warning")
+        self.is_pattern = bool(re.search(r'[*?\[]', self.metric))
+        self._fire = OPERATORS[self.op]
+        self._resolve = RESOLVE_OPERATORS[self.op]
+
+    def is_firing(self, observed):
+        return self._fire(observed, self.value)
+
+    def is_resolved(self, observed):
+        return self._resolve(observed, self.clear)
+
+    def matches(self, key):
+        if self.is_pattern:
+            return fnmatch(key, self.metric)
+        return key == self.metric
+
+class RuleState():
+    """
+    Evaluation state of a rule for one metric key
+    """
+
+    __slots__ = ('last_value', 'last_time', 'pending_since', 'firing')
+
+    def __init__(self):
+        self.last_value = None
+        self.last_time = None
+        self.pending_since = None
+        self.firing = False
+
+class AlertEngine():
+    """
+    Evaluate alert rules incrementally over published metrics
+
+    Rules are indexed by the metric keys they depend on, the index is built
+    lazily for each new key, so a sample only evaluates its own rules.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = []
+        self._exact = {}
+        self._patterns = []
+        self._index = {}
+        self._states = {}
+        self._entities = {}
+        if rules:
+            self.load(rules)
+
+    def load(self, rules):
+        """
+        Compile rule configs, replaces all rules and resets their states
+
+        Raises:
+            ValueError, KeyError: if a rule is invalid
+        """
+        compiled = [Rule(config) for config in rules]
+        self.rules = compiled
+        self._exact = {}
+        self._patterns = []
+        for rule in compiled:
+            if rule.is_pattern:
+                self._patterns.append(rule)
+            else:
+                self._exact.setdefault(rule.metric, []).append(rule)
+        self._index = {}
+        self._states = {}
+        self._entities = {}
+
+    def rules_for(self, key):
+        rules = self._index.get(key)
+        if rules is None:
+            rules = self._exact.get(key, []) + [rule for rule in self._patterns if rule.matches(key)]
+            self._index[key] = rules
+        return rules
+
+    def evaluate(self, data, now=None):
+        """
+        Feed a published data dict
+
+        Returns:
+            tuple: (firing alerts, resolved alerts), lists of alert dicts
+        """
+        if now is None:
+            now = time.monotonic()
+        firing = []
+        resolved = []
+        for list_key in ENTITY_LISTS:
+            if isinstance(data.get(list_key), list):
+                resolved += self._update_entities(list_key, data[list_key])
+        for key, value in data.items():
+            rules = self.rules_for(key)
+            if not rules or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            for rule in rules:
+                state = self._states.get((rule, key))
+                if state is None:
+                    state = RuleState()
+                    self._states[(rule, key)] = state
+                change = self._update(rule, state, value, now)
+                if change is None:
+                    continue
+                alert = {
+                    "name": rule.name,
+                    "metric": key,
+                    "value": value,
+                    "threshold": rule.value if change else rule.clear,
+                    "severity": rule.severity,
+                    "timestamp": time.time(),
+                }
+                (firing if change else resolved).append(alert)
+        return firing, resolved
+
+    def _update_entities(self, list_key, names):
+        """
+        Expire the states of entities that left an entity list, firing ones
+        resolve since their metric will not be published anymore
+
+        Returns:
+            list: resolved alerts
+        """
+        last = self._entities.get(list_key)
+        self._entities[list_key] = list(names)
+        if last is None:
+            return []
+        gone = [name for name in last if name not in names]
+        if not gone:
+            return []
+        prefix = ENTITY_LISTS[list_key][0]
+        gone = [f'{prefix}{name}_' for name in gone]
+        # A removed entity's prefix may also be the start of a current one's
+        current = [f'{prefix}{name}_' for name in names if isinstance(name, str)]
+
+        def is_gone(key):
+            return any(key.startswith(p) for p in gone) and not any(key.startswith(p) for p in current)
+
+        resolved = []
+        for (rule, key), state in list(self._states.items()):
+            if not is_gone(key):
+                continue
+            if state.firing:
+                resolved.append({
+                    "name": rule.name,
+                    "metric": key,
+                    "value": None,
+                    "threshold": rule.clear,
+                    "severity": rule.severity,
+                    "timestamp": time.time(),
+                })
+            del self._states[(rule, key)]
+        for key in list(self._index):
+            if is_gone(key):
+                del self._index[key]
+        return resolved
+
+    def _update(self, rule, state, value, now):
+        # Returns True when the alert fires, False when it resolves, None otherwise
+        observed = value
+        if rule.rate:
+            last_value, last_time = state.last_value, state.last_time
+            state.last_value, state.last_time = value, now
+            if last_time is None or now <= last_time:
+                return None
+            observed = (value - last_value) / (now - last_time)
+
+        if state.firing:
+            if rule.is_resolved(observed):
+                state.firing = False
+                state.pending_since = None
+                return False
+            return None
+
+        if not rule.is_firing(observed):
+            state.pending_since = None
+            return None
+        if state.pending_since is None:
+            state.pending_since = now
+        if now - state.pending_since < rule.duration:
+            return None
+        state.firing = True
+        return True
+
+    def active(self):
+        """
+        Get (rule name, metric key) of all firing alerts
+        """
+        return [(rule.name, key) for (rule, key), state in self._states.items() if state.firing]
@@ -0,0 +1,49 @@
+import time
+
+class MetricCache():
+    """
+    Latest value of every published metric with its sample timestamp
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def update(self, data, timestamp=None):
+        """
+        Store a published data dict, all keys share the same timestamp
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        for key, value in data.items():
+            self._values[key] = (value, timestamp)
+
+    def get(self, key, default=None):
+        """
+        Get the cached value of a metric
+        """
+        item = self._values.get(key)
+        if item is None:
+            return default
+        return item[0]
+
+    def snapshot_values(self):
+        """
+        Get cached metrics as {key: value}
+        """
+        return {key: value for key, (value, _) in list(self._values.items())}
+
+    def keys(self):
+        return list(self._values)
+
+    def snapshot(self, keys=None):
+        """
+        Get cached metrics as {key: {"value": value, "timestamp": timestamp}}
+
+        Args:
+            keys (list): Only include these keys, all if None
+        """
+        if keys is None:
+            items = list(self._values.items())
+        else:
+            items = [(key, self._values[key]) for key in keys if key in self._values]
+        return {key: {"value": value, "timestamp": timestamp} for key, (value, timestamp) in items}
@@ -0,0 +1,233 @@
+import ctypes
+import ctypes.util
+import os
+import re
+import time
+from glob import glob
+
+CGROUP_ROOT = 'sys/fs/cgroup'
+
+# Groups to collect, relative to the cgroup root
+DEFAULT_PATTERNS = [
+    'system.slice/*.service',
+    'system.slice/docker-*.scope',
+    'docker/*',
+]
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_ONLYDIR = 0x1000000
+
+def group_name(path):
+    """
+    Short name of a cgroup, e.g. "nginx" for system.slice/nginx.service and
+    "docker_0123456789ab" for a container
+    """
+    name = os.path.basename(path)
+    match = re.match(r'^(?:docker-)?([0-9a-f]{64})(?:\.scope)?$', name)
+    if match:
+        return f'docker_{match.group(1)[:12]}'
+    name = re.sub(r'\.(service|scope|slice)$', '', name)
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+class DirectoryWatcher():
+    """
+    Tell whether subdirectories were created or removed in watched directories
+
+    Uses inotify, falls back to comparing directory mtimes.
+    """
+
+    def __init__(self):
+        self._fd = None
+        self._libc = None
+        self._mtimes = {}
+        self._watched = set()
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._libc = libc
+                self._fd = fd
+        except (OSError, AttributeError):
+            pass
+
+    def watch(self, path):
+        if path in self._watched or not os.path.isdir(path):
+            return
+        self._watched.add(path)
+        if self._fd is not None:
+            self._libc.inotify_add_watch(self._fd, path.encode(), IN_CREATE | IN_DELETE | IN_ONLYDIR)
+        else:
+            self._mtimes[path] = os.stat(path).st_mtime_ns
+
+    def changed(self):
+        """
+        Check and clear pending changes
+        """
+        if self._fd is not None:
+            changed = False
+            while True:
+                try:
+                    if not os.read(self._fd, 4096):
+                        break
+                    changed = True
+                except BlockingIOError:
+                    break
+            return changed
+        changed = False
+        for path in list(self._mtimes):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._mtimes[path]:
+                self._mtimes[path] = mtime
+                changed = True
+        return changed
+
+    def reset(self):
+        """
+        Forget the last sample, so the first rate after a pause is not
+        computed over the whole pause
+        """
+        self._last.clear()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class CgroupCollector():
+    """
+    Resource usage of cgroup v2 groups: CPU, memory, memory pressure and IO
+
+    Discovered groups are cached, discovery only runs again when a watched
+    directory gets a group created or removed. Rates are computed from
+    counter deltas between calls.
+    """
+
+    def __init__(self, patterns=None, root='/', log=None):
+        self.cgroup_root = os.path.join(root, CGROUP_ROOT)
+        self.patterns = list(patterns or DEFAULT_PATTERNS)
+        self.log = log
+        self.groups = {}
+        self._last = {}
+        self._watcher = DirectoryWatcher()
+        self._discovered = False
+
+    def set_patterns(self, patterns):
+        self.patterns = list(patterns)
+        self._discovered = False
+
+    def discover(self):
+        """
+        Find groups matching the patterns and watch their parent directories
+        """
+        groups = {}
+        self._watcher.watch(self.cgroup_root)
+        for pattern in self.patterns:
+            self._watcher.watch(os.path.join(self.cgroup_root, os.path.dirname(pattern)))
+            for path in glob(os.path.join(self.cgroup_root, pattern)):
+                if os.path.isdir(path):
+                    groups[group_name(path)] = path
+        self.groups = groups
+        for name in list(self._last):
+            if name not in groups:
+                del self._last[name]
+        self._discovered = True
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'r') as f:
+            return f.read()
+
+    @classmethod
+    def _read_optional(cls, path):
+        # Controller files only exist when the controller or PSI is enabled
+        try:
+            return cls._read(path)
+        except FileNotFoundError:
+            return None
+
+    def read_group(self, path):
+        """
+        Read the raw counters of a group, cpu.stat is always there, the
+        others only if their controller is enabled
+
+        Returns:
+            dict: cpu_usec, memory, memory_pressure, io_read, io_write, those available
+        """
+        values = {}
+        for line in self._read(f'{path}/cpu.stat').splitlines():
+            key, _, value = line.partition(' ')
+            if key == 'usage_usec':
+                values['cpu_usec'] = int(value)
+                break
+        memory = self._read_optional(f'{path}/memory.current')
+        if memory is not None:
+            values['memory'] = int(memory)
+        pressure = self._read_optional(f'{path}/memory.pressure')
+        if pressure is not None:
+            match = re.search(r'^some avg10=([\d.]+)', pressure, re.M)
+            values['memory_pressure'] = float(match.group(1)) if match else 0.0
+        io = self._read_optional(f'{path}/io.stat')
+        if io is not None:
+            read_bytes = write_bytes = 0
+            for line in io.splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition('=')
+                    if key == 'rbytes':
+                        read_bytes += int(value)
+                    elif key == 'wbytes':
+                        write_bytes += int(value)
+            values['io_read'] = read_bytes
+            values['io_write'] = write_bytes
+        return values
+
+    def collect(self):
+        """
+        Sample all groups and return usage and rates since the last call
+
+        Returns:
+            dict: flat data dict ready to publish
+        """
+        if not self._discovered or self._watcher.changed():
+            self.discover()
+
+        now = time.monotonic()
+        data = {}
+        names = []
+        for name, path in list(self.groups.items()):
+            try:
+                values = self.read_group(path)
+            except (OSError, ValueError) as e:
+                # Removed between discovery and read, next discovery drops it
+                if self.log:
+                    self.log.debug(f"Read cgroup {path} error: {e}")
+                continue
+            names.append(name)
+            prefix = f'cgroup_{name}'
+            for key in ('memory', 'memory_pressure'):
+                if key in values:
+                    data[f'{prefix}_{key}'] = values[key]
+            last = self._last.get(name)
+            self._last[name] = (now, values)
+            if last is None:
+                continue
+            last_time, last_values = last
+            interval = now - last_time
+            if interval <= 0:
+                continue
+            if 'cpu_usec' in values and 'cpu_usec' in last_values:
+                cpu = max(0, values['cpu_usec'] - last_values['cpu_usec'])
+                data[f'{prefix}_cpu_percent'] = round(cpu / (interval * 1e6) * 100, 2)
+            for key in ('io_read', 'io_write'):
+                if key in values and key in last_values:
+                    data[f'{prefix}_{key}'] = int(max(0, values[key] - last_values[key]) / interval)
+        data['cgroup_list'] = names
+        return data
+
+    def close(self):
+        self._watcher.close()
@@ -0,0 +1,201 @@
+import os
+import time
+from glob import glob
+
+CPUFREQ_DIR = 'sys/devices/system/cpu/cpufreq'
+
+# Profile names follow FanMode so both can be switched together.
+# governors: preferred governors in order, the first available one is used
+# min/max: scaling range as a ratio of cpuinfo_min_freq..cpuinfo_max_freq
+# energy_preference: energy_performance_preference, if the driver has it
+PROFILES = {
+    "quiet": {
+        "governors": ["schedutil", "ondemand", "conservative"],
+        "min": 0,
+        "max": 0.75,
+        "energy_preference": "power",
+    },
+    "normal": {
+        "governors": ["ondemand", "schedutil"],
+        "min": 0,
+        "max": 1,
+        "energy_preference": "balance_performance",
+    },
+    "performance": {
+        "governors": ["performance"],
+        "min": 1,
+        "max": 1,
+        "energy_preference": "performance",
+    },
+}
+
+AUTO = "auto"
+
+def _read(path):
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+def _write(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+class CpuProfileManager():
+    """
+    Apply CPU frequency profiles through cpufreq sysfs
+
+    Only the values that differ from the current ones are written. The values
+    found before the first write are kept, restore() puts them back.
+    """
+
+    def __init__(self, root='/', log=None):
+        self.cpufreq_dir = os.path.join(root, CPUFREQ_DIR)
+        self.log = log
+        self.profile = None
+        self._original = {}
+
+    def policies(self):
+        return sorted(glob(os.path.join(self.cpufreq_dir, 'policy*')))
+
+    def targets(self, policy, profile):
+        """
+        Get the sysfs values a profile needs on a policy
+
+        Returns:
+            dict: {file name: value}
+        """
+        settings = PROFILES[profile]
+        targets = {}
+
+        available = _read(f'{policy}/scaling_available_governors').split()
+        for governor in settings["governors"]:
+            if governor in available:
+                targets['scaling_governor'] = governor
+                break
+
+        low = int(_read(f'{policy}/cpuinfo_min_freq'))
+        high = int(_read(f'{policy}/cpuinfo_max_freq'))
+        frequencies = []
+        if os.path.exists(f'{policy}/scaling_available_frequencies'):
+            frequencies = sorted(int(freq) for freq in _read(f'{policy}/scaling_available_frequencies').split())
+
+        def frequency(ratio):
+            freq = int(low + (high - low) * ratio)
+            # Snap down to a supported frequency, the driver would round anyway
+            supported = [f for f in frequencies if f <= freq]
+            return supported[-1] if supported else freq
+
+        targets['scaling_min_freq'] = frequency(settings["min"])
+        targets['scaling_max_freq'] = frequency(settings["max"])
+
+        if os.path.exists(f'{policy}/energy_performance_available_preferences'):
+            preferences = _read(f'{policy}/energy_performance_available_preferences').split()
+            if settings["energy_preference"] in preferences:
+                targets['energy_performance_preference'] = settings["energy_preference"]
+        return targets
+
+    def _write(self, policy, targets):
+        """
+        Write the values that differ to a policy, capturing the originals
+
+        Returns:
+            list: [(policy name, file name, value), ...] values written
+        """
+        written = []
+        names = ['scaling_governor', 'scaling_min_freq', 'scaling_max_freq', 'energy_performance_preference']
+        # Keep min <= max while writing
+        if 'scaling_min_freq' in targets and \
+                int(targets['scaling_min_freq']) > int(_read(f'{policy}/scaling_max_freq')):
+            names[1], names[2] = names[2], names[1]
+        original = self._original.setdefault(policy, {})
+        for name in names:
+            if name not in targets:
+                continue
+            value = str(targets[name])
+            current = _read(f'{policy}/{name}')
+            if current != value:
+                original.setdefault(name, current)
+                _write(f'{policy}/{name}', value)
+                written.append((os.path.basename(policy), name, value))
+        return written
+
+    def apply(self, profile):
+        """
+        Apply a profile to every cpufreq policy
+
+        Returns:
+            list: [(policy name, file name, value), ...] values written
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Invalid CPU profile: {profile}")
+        written = []
+        for policy in self.policies():
+            try:
+                written += self._write(policy, self.targets(policy, profile))
+            except (OSError, ValueError) as e:
+                if self.log:
+                    self.log.error(f"Apply CPU profile {profile} to {policy} failed: {e}")
+        self.profile = profile
+        return written
+
+    def restore(self):
+        """
+        Put back the values found before the first profile was applied,
+        giving control back to the OS policy
+
+        Returns:
+            list: [(policy name, file name, value), ...] values written
+        """
+        written = []
+        for policy, values in list(self._original.items()):
+            try:
+                written += self._write(policy, dict(values))
+            except (OSError, ValueError) as e:
+                if self.log:
+                    self.log.error(f"Restore CPU frequency settings of {policy} failed: {e}")
+        self._original = {}
+        self.profile = None
+        return written
+
+class AutoProfile():
+    """
+    Pick a profile from sustained CPU load with hysteresis
+
+    Switch up when load stays above high_percent for up_seconds, and back
+    down when it stays below low_percent for down_seconds.
+    """
+
+    def __init__(self, low_profile="quiet", high_profile="performance",
+                 high_percent=80, up_seconds=10, low_percent=30, down_seconds=60):
+        self.low_profile = low_profile
+        self.high_profile = high_profile
+        self.high_percent = high_percent
+        self.up_seconds = up_seconds
+        self.low_percent = low_percent
+        self.down_seconds = down_seconds
+        self.profile = low_profile
+        self._since = None
+
+    def update(self, cpu_percent, now=None):
+        """
+        Feed a CPU load sample
+
+        Returns:
+            str: the profile to switch to, None if unchanged
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.profile == self.low_profile:
+            crossing, hold, target = cpu_percent >= self.high_percent, self.up_seconds, self.high_profile
+        else:
+            crossing, hold, target = cpu_percent <= self.low_percent, self.down_seconds, self.low_profile
+
+        if not crossing:
+            self._since = None
+            return None
+        if self._since is None:
+            self._since = now
+        if now - self._since < hold:
+            return None
+        self._since = None
+        self.profile = target
+        return target
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+
+DEFAULT_OUTPUT_DIR = '/tmp/sunfounder-system-manager'
+DEFAULT_PROFILE_SECONDS = 30
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+
+class SamplingProfiler():
+    """
+    Sample the stacks of all threads at a fixed interval
+
+    Output is in collapsed stack format ("frame;frame;frame count"), ready for
+    flamegraph tools. Nothing runs unless a profile is in progress.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._stop.set()
+        self._thread = None
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def start(self, seconds, callback):
+        """
+        Sample for seconds, then call callback(profiler)
+
+        A run still finishing is stopped and waited for first, so runs never
+        share their stacks.
+        """
+        self.stop()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.stacks = Counter()
+        # Each run has its own stop event, an old run can't stop a new one
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, args=(seconds, callback, self._stop, self.stacks))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, seconds, callback, stop, stacks):
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while not stop.is_set() and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                stacks[';'.join(reversed(stack))] += 1
+            stop.wait(self.interval)
+        stop.set()
+        callback(self)
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+class DebugHooks():
+    """
+    On-demand diagnostics for a running daemon
+
+    SIGUSR1 dumps thread and asyncio task stacks, SIGUSR2 toggles the
+    sampling profiler. The same actions plus tracemalloc dumps are available
+    through handle(). Outputs are written to output_dir.
+    """
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR, log=None):
+        self.output_dir = output_dir
+        self.log = log
+        self.loop = None
+        self.profiler = SamplingProfiler()
+        self._snapshot = None
+
+    def install(self, loop=None):
+        """
+        Register signal handlers, must be called from the main thread
+        """
+        self.loop = loop
+        try:
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.dump_stacks())
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self.toggle_profiler())
+        except ValueError as e:
+            if self.log:
+                self.log.warning(f"Debug signal handlers not installed: {e}")
+
+    def handle(self, action, **params):
+        """
+        Run a debug action
+
+        Args:
+            action (str): "stacks", "profile", "profile_stop", "tracemalloc" or "tracemalloc_stop"
+
+        Returns:
+            str: Output file path, None if nothing written
+        """
+        if action == "stacks":
+            return self.dump_stacks()
+        elif action == "profile":
+            self.start_profiler(params.get("seconds", DEFAULT_PROFILE_SECONDS))
+        elif action == "profile_stop":
+            self.profiler.stop()
+        elif action == "tracemalloc":
+            return self.dump_tracemalloc()
+        elif action == "tracemalloc_stop":
+            tracemalloc.stop()
+            self._snapshot = None
+        else:
+            raise ValueError(f"Invalid debug action: {action}")
+        return None
+
+    def _open(self, name, extension):
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}.{extension}')
+        if self.log:
+            self.log.info(f"Write {name} to {path}")
+        return path, open(path, 'w')
+
+    def dump_stacks(self):
+        path, f = self._open('stacks', 'txt')
+        with f:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                f.write(f'Thread {names.get(thread_id, thread_id)}:\n')
+                f.write(''.join(traceback.format_stack(frame)))
+                f.write('\n')
+            if self.loop is not None:
+                for task in asyncio.all_tasks(self.loop):
+                    f.write(f'{task!r}:\n')
+                    for frame in task.get_stack():
+                        f.write(''.join(traceback.format_stack(frame, limit=1)))
+                    f.write('\n')
+        return path
+
+    def toggle_profiler(self):
+        if self.profiler.running:
+            self.profiler.stop()
+        else:
+            self.start_profiler(DEFAULT_PROFILE_SECONDS)
+
+    def start_profiler(self, seconds):
+        if self.profiler.running:
+            return
+        if self.log:
+            self.log.info(f"Start sampling profiler for {seconds}s")
+        self.profiler.start(seconds, self._write_profile)
+
+    def _write_profile(self, profiler):
+        # Runs on the profiler thread, nothing else would report the error
+        try:
+            path, f = self._open('profile', 'collapsed')
+            with f:
+                f.write(profiler.collapsed())
+        except OSError as e:
+            if self.log:
+                self.log.error(f"Write profile failed: {e}")
+
+    def dump_tracemalloc(self):
+        """
+        Start tracing on the first call, then dump top allocations and the
+        difference to the previous dump
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._snapshot = tracemalloc.take_snapshot()
+            if self.log:
+                self.log.info("tracemalloc started, dump again to see allocations")
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        path, f = self._open('tracemalloc', 'txt')
+        with f:
+            f.write(f'Top {TOP_ALLOCATIONS} allocations:\n')
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                f.write(f'{stat}\n')
+            if self._snapshot is not None:
+                f.write(f'\nTop {TOP_ALLOCATIONS} differences since last dump:\n')
+                for stat in snapshot.compare_to(self._snapshot, 'lineno')[:TOP_ALLOCATIONS]:
+                    f.write(f'{stat}\n')
+        self._snapshot = snapshot
+        return path
@@ -0,0 +1,355 @@
+import ctypes
+import errno
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_INTERVAL = 120
+DEFAULT_TIMEOUT = 5
+# Probes failing with ENOTTY/EINVAL this many times in a row mark the disk unsupported
+UNSUPPORTED_ERRORS = 3
+
+SG_IO = 0x2285
+SG_INTERFACE_ID = ord('S')
+SG_DXFER_NONE = -1
+SG_DXFER_FROM_DEV = -3
+DRIVER_SENSE = 0x08
+
+SENSE_KEY_NO_SENSE = 0x0
+SENSE_KEY_RECOVERED_ERROR = 0x1
+
+ATA_PASS_THROUGH_16 = 0x85
+ATA_CHECK_POWER_MODE = 0xE5
+ATA_SMART = 0xB0
+ATA_SMART_READ_DATA = 0xD0
+SMART_ATTRIBUTE_TEMPERATURE = 194
+SMART_ATTRIBUTE_AIRFLOW_TEMPERATURE = 190
+
+# _IOWR('N', 0x41, struct nvme_admin_cmd)
+NVME_IOCTL_ADMIN_CMD = 0xC0484E41
+NVME_ADMIN_GET_LOG_PAGE = 0x02
+NVME_LOG_SMART = 0x02
+NVME_NSID_ALL = 0xFFFFFFFF
+
+SECTOR_SIZE = 512
+
+class SgIoHdr(ctypes.Structure):
+    _fields_ = [
+        ('interface_id', ctypes.c_int),
+        ('dxfer_direction', ctypes.c_int),
+        ('cmd_len', ctypes.c_ubyte),
+        ('mx_sb_len', ctypes.c_ubyte),
+        ('iovec_count', ctypes.c_ushort),
+        ('dxfer_len', ctypes.c_uint),
+        ('dxferp', ctypes.c_void_p),
+        ('cmdp', ctypes.c_void_p),
+        ('sbp', ctypes.c_void_p),
+        ('timeout', ctypes.c_uint),
+        ('flags', ctypes.c_uint),
+        ('pack_id', ctypes.c_int),
+        ('usr_ptr', ctypes.c_void_p),
+        ('status', ctypes.c_ubyte),
+        ('masked_status', ctypes.c_ubyte),
+        ('msg_status', ctypes.c_ubyte),
+        ('sb_len_wr', ctypes.c_ubyte),
+        ('host_status', ctypes.c_ushort),
+        ('driver_status', ctypes.c_ushort),
+        ('resid', ctypes.c_int),
+        ('duration', ctypes.c_uint),
+        ('info', ctypes.c_uint),
+    ]
+
+class NvmeAdminCmd(ctypes.Structure):
+    _fields_ = [
+        ('opcode', ctypes.c_uint8),
+        ('flags', ctypes.c_uint8),
+        ('rsvd1', ctypes.c_uint16),
+        ('nsid', ctypes.c_uint32),
+        ('cdw2', ctypes.c_uint32),
+        ('cdw3', ctypes.c_uint32),
+        ('metadata', ctypes.c_uint64),
+        ('addr', ctypes.c_uint64),
+        ('metadata_len', ctypes.c_uint32),
+        ('data_len', ctypes.c_uint32),
+        ('cdw10', ctypes.c_uint32),
+        ('cdw11', ctypes.c_uint32),
+        ('cdw12', ctypes.c_uint32),
+        ('cdw13', ctypes.c_uint32),
+        ('cdw14', ctypes.c_uint32),
+        ('cdw15', ctypes.c_uint32),
+        ('timeout_ms', ctypes.c_uint32),
+        ('result', ctypes.c_uint32),
+    ]
+
+def parse_smart_temperature(data):
+    """
+    Get the temperature from ATA SMART data, None if not reported
+    """
+    temperatures = {}
+    for i in range(30):
+        offset = 2 + i * 12
+        attribute = data[offset]
+        if attribute in (SMART_ATTRIBUTE_TEMPERATURE, SMART_ATTRIBUTE_AIRFLOW_TEMPERATURE):
+            # Lowest byte of the raw value is the current temperature
+            temperatures[attribute] = data[offset + 5]
+    for attribute in (SMART_ATTRIBUTE_TEMPERATURE, SMART_ATTRIBUTE_AIRFLOW_TEMPERATURE):
+        if attribute in temperatures:
+            return float(temperatures[attribute])
+    return None
+
+class IoctlTransport():
+    """
+    Read disk power mode and temperature in-process with SG_IO and NVMe ioctls
+
+    SATA disks, including behind most USB bridges, are queried with ATA
+    PASS-THROUGH, NVMe disks with the SMART / health log page.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, dev_dir='/dev'):
+        self.timeout = timeout
+        self.dev_dir = dev_dir
+
+    def _open(self, name):
+        return os.open(os.path.join(self.dev_dir, name), os.O_RDONLY | os.O_NONBLOCK)
+
+    def _ata(self, fd, cdb, data_len=0):
+        cdb = (ctypes.c_ubyte * 16)(*cdb)
+        sense = (ctypes.c_ubyte * 32)()
+        data = (ctypes.c_ubyte * max(data_len, 1))()
+        hdr = SgIoHdr()
+        hdr.interface_id = SG_INTERFACE_ID
+        hdr.dxfer_direction = SG_DXFER_FROM_DEV if data_len else SG_DXFER_NONE
+        hdr.cmd_len = len(cdb)
+        hdr.mx_sb_len = len(sense)
+        hdr.dxfer_len = data_len
+        hdr.dxferp = ctypes.addressof(data)
+        hdr.cmdp = ctypes.addressof(cdb)
+        hdr.sbp = ctypes.addressof(sense)
+        hdr.timeout = int(self.timeout * 1000)
+        fcntl.ioctl(fd, SG_IO, hdr)
+        driver_status = hdr.driver_status & 0x0F
+        # DRIVER_SENSE with sense data is a normal answer, ck_cond always
+        # returns one, the caller judges it from the sense data
+        if driver_status == DRIVER_SENSE and hdr.sb_len_wr:
+            driver_status = 0
+        if hdr.host_status or driver_status:
+            raise OSError(errno.EIO, f'SG_IO failed, host status {hdr.host_status}, driver status {hdr.driver_status}')
+        return bytes(data), bytes(sense[:hdr.sb_len_wr])
+
+    @staticmethod
+    def _sense_key(sense):
+        if not sense:
+            return SENSE_KEY_NO_SENSE
+        if sense[0] & 0x7F in (0x72, 0x73):
+            return sense[1] & 0x0F
+        if sense[0] & 0x7F in (0x70, 0x71) and len(sense) > 2:
+            return sense[2] & 0x0F
+        return SENSE_KEY_NO_SENSE
+
+    @staticmethod
+    def _sector_count(sense):
+        """
+        Get the ATA count register from pass-through sense data, descriptor
+        or fixed format, None if not there
+        """
+        if len(sense) >= 22 and sense[0] & 0x7F == 0x72 and sense[8] == 0x09:
+            # ATA Status Return descriptor
+            return sense[8 + 5]
+        if len(sense) >= 7 and sense[0] & 0x7F in (0x70, 0x71):
+            # Information field: error, status, device, count
+            return sense[6]
+        return None
+
+    def supports(self, name):
+        """
+        Check if a disk may report its temperature, SD cards have no SMART
+        """
+        return not name.startswith('mmcblk')
+
+    def power_mode(self, name):
+        """
+        Get the power mode of a disk without waking it up
+
+        Returns:
+            str: "active", "standby", or None if unknown
+        """
+        if name.startswith('nvme'):
+            return 'active'
+        fd = self._open(name)
+        try:
+            # CHECK POWER MODE, non-data, ck_cond to get the count register back
+            cdb = [ATA_PASS_THROUGH_16, 3 << 1, 0x20, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, ATA_CHECK_POWER_MODE, 0]
+            _, sense = self._ata(fd, cdb)
+        finally:
+            os.close(fd)
+        count = self._sector_count(sense)
+        if count is None:
+            return None
+        # 0x00 standby, 0x40/0x41 spun down with NV cache
+        return 'standby' if count in (0x00, 0x40, 0x41) else 'active'
+
+    def temperature(self, name):
+        """
+        Get the disk temperature in °C, None if not supported
+        """
+        fd = self._open(name)
+        try:
+            if name.startswith('nvme'):
+                return self._nvme_temperature(fd)
+            # SMART READ DATA, PIO data-in, one sector
+            cdb = [ATA_PASS_THROUGH_16, 4 << 1, 0x0E, 0, ATA_SMART_READ_DATA, 0, 1, 0, 0, 0, 0x4F, 0, 0xC2, 0, ATA_SMART, 0]
+            data, sense = self._ata(fd, cdb, SECTOR_SIZE)
+            if self._sense_key(sense) not in (SENSE_KEY_NO_SENSE, SENSE_KEY_RECOVERED_ERROR):
+                raise OSError(errno.EINVAL, f'SMART READ DATA rejected, sense key {self._sense_key(sense)}')
+            return parse_smart_temperature(data)
+        finally:
+            os.close(fd)
+
+    def _nvme_temperature(self, fd):
+        data = (ctypes.c_ubyte * SECTOR_SIZE)()
+        cmd = NvmeAdminCmd()
+        cmd.opcode = NVME_ADMIN_GET_LOG_PAGE
+        cmd.nsid = NVME_NSID_ALL
+        cmd.addr = ctypes.addressof(data)
+        cmd.data_len = SECTOR_SIZE
+        cmd.cdw10 = NVME_LOG_SMART | ((SECTOR_SIZE // 4 - 1) << 16)
+        cmd.timeout_ms = int(self.timeout * 1000)
+        fcntl.ioctl(fd, NVME_IOCTL_ADMIN_CMD, cmd)
+        # Composite temperature in Kelvin
+        kelvin = data[1] | (data[2] << 8)
+        return float(kelvin - 273) if kelvin else None
+
+class DiskTemperatureEngine():
+    """
+    Probe disk temperatures concurrently on their own cadence
+
+    update() never blocks, probes run in a thread pool and results land in
+    the cache. Disks in standby are not probed, so they can stay spun down,
+    and keep reporting their last temperature with its age. A probe that
+    hangs past the timeout is not resubmitted until it returns, the disk is
+    reported stale meanwhile. SMART is never read from a disk whose power
+    mode is unknown, it might spin it up. Disks without SMART, rejecting the
+    ioctls or not reporting their power mode repeatedly, are not probed again.
+
+    Args:
+        transport: Object with supports(name), power_mode(name) and temperature(name), IoctlTransport if None
+        interval (float): Seconds between probes of a disk
+        timeout (float): Seconds a probe may take
+    """
+
+    def __init__(self, transport=None, interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT, max_workers=4, log=None):
+        self.transport = transport or IoctlTransport(timeout=timeout)
+        self.interval = interval
+        self.timeout = timeout
+        self.log = log
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._cache = {}
+        self._standby = {}
+        self._in_flight = {}
+        self._last_probe = {}
+        self._unsupported = set()
+        self._errors = {}
+        self._timed_out = set()
+
+    def update(self, disks):
+        """
+        Start probes for disks that are due
+        """
+        now = time.monotonic()
+        for name in disks:
+            if name in self._unsupported:
+                continue
+            if not self.transport.supports(name):
+                self._unsupported.add(name)
+                continue
+            started = self._in_flight.get(name)
+            if started is not None:
+                if now - started > self.timeout and name not in self._timed_out:
+                    with self._lock:
+                        self._timed_out.add(name)
+                    if self.log:
+                        self.log.warning(f"Disk {name} temperature probe timed out")
+                continue
+            if now - self._last_probe.get(name, -self.interval) < self.interval:
+                continue
+            self._last_probe[name] = now
+            self._in_flight[name] = now
+            self._executor.submit(self._probe, name)
+
+    def _probe(self, name):
+        try:
+            mode = self.transport.power_mode(name)
+            if mode == 'standby':
+                with self._lock:
+                    self._standby[name] = True
+                    self._errors.pop(name, None)
+                return
+            if mode is None:
+                self._failed(name, "power mode unknown, skip SMART read")
+                return
+            temperature = self.transport.temperature(name)
+            with self._lock:
+                self._standby[name] = False
+                self._errors.pop(name, None)
+                if temperature is None:
+                    self._unsupported.add(name)
+                else:
+                    self._cache[name] = (temperature, time.monotonic())
+        except OSError as e:
+            if e.errno in (errno.ENOTTY, errno.EINVAL):
+                self._failed(name, e)
+            elif self.log:
+                self.log.debug(f"Disk {name} temperature probe failed: {e}")
+        finally:
+            with self._lock:
+                self._timed_out.discard(name)
+            self._in_flight.pop(name, None)
+
+    def _failed(self, name, reason):
+        # Count failures meaning the disk can't be probed, give up after a few
+        if self.log:
+            self.log.debug(f"Disk {name} temperature probe failed: {reason}")
+        with self._lock:
+            errors = self._errors.get(name, 0) + 1
+            self._errors[name] = errors
+            if errors < UNSUPPORTED_ERRORS:
+                return
+            self._unsupported.add(name)
+        if self.log:
+            self.log.info(f"Disk {name} does not support temperature probes, skip it")
+
+    def results(self):
+        """
+        Get cached temperatures
+
+        Returns:
+            dict: {name: {"temperature": °C, "age": seconds, "standby": bool, "stale": bool}},
+                stale disks have a probe hung past the timeout, temperature and
+                age are None for disks in standby or stale before returning one
+        """
+        now = time.monotonic()
+        with self._lock:
+            results = {
+                name: {
+                    "temperature": temperature,
+                    "age": round(now - timestamp, 1),
+                    "standby": self._standby.get(name, False),
+                    "stale": name in self._timed_out,
+                }
+                for name, (temperature, timestamp) in self._cache.items()
+            }
+            for name in set(self._timed_out) | {name for name, standby in self._standby.items() if standby}:
+                if name not in results:
+                    results[name] = {
+                        "temperature": None,
+                        "age": None,
+                        "standby": self._standby.get(name, False),
+                        "stale": name in self._timed_out,
+                    }
+            return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,179 @@
+import math
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+EOF_LINE = b'# EOF\n'
+
+def metric_name(key, prefix='sunfounder_'):
+    """
+    Convert a data key to a valid OpenMetrics metric name
+    """
+    return prefix + re.sub(r'[^a-zA-Z0-9_]', '_', key)
+
+def format_value(value):
+    """
+    Format a sample value, special floats as OpenMetrics spells them
+    """
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+    return str(value)
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Entity list keys, the key prefix of their per-entity metrics and the label
+# the entity name goes to, e.g. network_eth0_upload is exported as
+# sunfounder_network_upload{interface="eth0"}
+ENTITY_LISTS = {
+    'network_interfaces': ('network_', 'interface'),
+    'cgroup_list': ('cgroup_', 'cgroup'),
+    'disk_list': ('disk_', 'disk'),
+}
+CPU_KEY = re.compile(r'^cpu_(\d+)_(.+)$')
+
+class OpenMetricsExporter():
+    """
+    Serve the latest published values in OpenMetrics text format
+
+    Per-entity keys are exported as one family per quantity, with the entity
+    in a label. Each sample is rendered once when its value changes, and the
+    exposition body is only rebuilt on the first scrape after a change, so
+    scrapes never trigger a collection.
+    """
+
+    def __init__(self, host='0.0.0.0', port=9110, log=None):
+        self.host = host
+        self.port = port
+        self.log = log
+        self._values = {}
+        # key: (family name, label string, rendered sample line)
+        self._samples = {}
+        # key: (entity list key, entity name) for per-entity keys
+        self._owners = {}
+        self._entities = {}
+        self._body = EOF_LINE
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def update(self, data):
+        """
+        Update metrics from a published data dict
+
+        A metric published as None or another non-numeric value is removed, so
+        a failed read is not scraped as its last value. Metrics of entities
+        leaving an entity list, e.g. network_interfaces, are removed too.
+        """
+        with self._lock:
+            # Entity lists first, they tell how to split the keys published with them
+            for key in ENTITY_LISTS:
+                if isinstance(data.get(key), list):
+                    self._update_entities(key, data[key])
+            for key, value in data.items():
+                if key in ENTITY_LISTS:
+                    continue
+                if isinstance(value, bool):
+                    value = int(value)
+                elif not isinstance(value, (int, float)):
+                    self._remove(key)
+                    continue
+                if key in self._samples and self._values.get(key) == value:
+                    continue
+                self._values[key] = value
+                family, labels = self._split(key)
+                name = metric_name(family)
+                self._samples[key] = (name, labels, f'{name}{labels} {format_value(value)}\n'.encode())
+                self._dirty = True
+
+    def _split(self, key):
+        """
+        Split a key into its family and label string
+        """
+        for list_key, (prefix, label) in ENTITY_LISTS.items():
+            if not key.startswith(prefix):
+                continue
+            # Longest name wins, eth0_a over eth0 for network_eth0_a_upload
+            matches = [name for name in self._entities.get(list_key, []) if key.startswith(f'{prefix}{name}_')]
+            if matches:
+                name = max(matches, key=len)
+                self._owners[key] = (list_key, name)
+                return prefix + key[len(prefix) + len(name) + 1:], f'{{{label}="{escape_label(name)}"}}'
+        match = CPU_KEY.match(key)
+        if match:
+            return f'cpu_{match.group(2)}', f'{{cpu="{match.group(1)}"}}'
+        return key, ''
+
+    def _remove(self, key):
+        self._values.pop(key, None)
+        self._owners.pop(key, None)
+        if self._samples.pop(key, None) is not None:
+            self._dirty = True
+
+    def _update_entities(self, list_key, names):
+        last = self._entities.get(list_key, [])
+        self._entities[list_key] = [name for name in names if isinstance(name, str)]
+        gone = set(last) - set(names)
+        if not gone:
+            return
+        for key, owner in list(self._owners.items()):
+            if owner[0] == list_key and owner[1] in gone:
+                self._remove(key)
+
+    def render(self):
+        """
+        Get the exposition body
+        """
+        with self._lock:
+            if self._dirty:
+                families = {}
+                seen = set()
+                for name, labels, line in self._samples.values():
+                    # Keys sanitised to the same name, keep the first sample only
+                    if (name, labels) in seen:
+                        continue
+                    seen.add((name, labels))
+                    families.setdefault(name, []).append(line)
+                self._body = b''.join(
+                    f'# TYPE {name} gauge\n'.encode() + b''.join(lines)
+                    for name, lines in families.items()) + EOF_LINE
+                self._dirty = False
+            return self._body
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = exporter.render()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        if self.log:
+            self.log.info(f"OpenMetrics exporter listening on {self.host}:{self.port}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
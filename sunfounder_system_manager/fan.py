@@ -1,8 +1,11 @@
 from pm_auto.libs.addon import Addon
 from pm_auto.libs.utils import run_command, log_error, softlink_gpiochip0_to_gpiochip4
+from .sensors import default_bus, read_cpu_temperature
+from .thermal_events import ThermalEventSource
 
 import subprocess
 import os
+import time
 import asyncio
 
 FANS = [
@@ -42,6 +45,8 @@ FAN_LEVELS = [
 ]
 
 INTERVAL = 1
+# Resync mirrored fans at least this often when event driven
+EVENT_RESYNC_INTERVAL = 60
 
 class FanAddon(Addon):
     
@@ -53,10 +58,14 @@ class FanAddon(Addon):
     }
 
     @log_error
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, sample_bus=None, **kwargs):
         super().__init__(*args, **kwargs)
         fans = self.peripherals
 
+        # Share sensor reads with telemetry, each sensor is read once per tick
+        self.sample_bus = sample_bus or default_bus
+        self.sample_bus.register('cpu_temperature', read_cpu_temperature)
+
         self.gpio_fan = Fan()
         self.spc_fan = Fan()
         self.pwm_fan = Fan()
@@ -86,7 +95,11 @@ class FanAddon(Addon):
             self.pwm_fan = PWMFan(log=self.log)
             if not self.pwm_fan.is_ready():
                 self.log.warning("PWM Fan init failed, disable pwm_fan control")
+            else:
+                self.sample_bus.register('pwm_fan_speed', self.pwm_fan.get_speed)
+                self.sample_bus.register('pwm_fan_state', self.pwm_fan.get_state)
 
+        self.thermal_events = None
         self.level = 0
         self.initial = True
         self._is_ready = True
@@ -151,14 +164,11 @@ class FanAddon(Addon):
 
     @log_error
     def get_cpu_temperature(self):
-        file = '/sys/class/thermal/thermal_zone0/temp'
-        try:
-            with open(file, 'r') as f:
-                temp = int(f.read())
-            return round(temp/1000, 2)
-        except Exception as e:
-            self.log.error(f'get_cpu_temperature error: {e}')
+        temperature = read_cpu_temperature()
+        if temperature is None:
+            self.log.error('get_cpu_temperature error')
             return 0.0
+        return temperature
 
     @log_error
     def run(self):
@@ -168,9 +178,9 @@ class FanAddon(Addon):
                 self.log.info("PWM Fan is supported, sync all other fan with pwm fan")
                 self.initial = False
             # Sync all other fan with pwm fan
-            pwm_fan_speed = self.pwm_fan.get_speed()
+            pwm_fan_speed = self.sample_bus.value('pwm_fan_speed')
             data["pwm_fan_speed"] = pwm_fan_speed
-            pwm_fan_level = self.pwm_fan.get_state()
+            pwm_fan_level = self.sample_bus.value('pwm_fan_state')
             if self.spc_fan.is_ready():
                 spc_fan_power = FAN_LEVELS[pwm_fan_level]['percent']
                 self.spc_fan.set_power(spc_fan_power)
@@ -180,7 +190,11 @@ class FanAddon(Addon):
                 data["gpio_fan_state"] = gpio_fan_state
                 self.gpio_fan.set(gpio_fan_state)
         else:
-            temperature = self.get_cpu_temperature()
+            temperature = self.sample_bus.value('cpu_temperature')
+            if temperature is None:
+                # Keep the current level until the temperature can be read again
+                self.log.error('get_cpu_temperature error')
+                return
             self.log.debug(f"cpu temperature: {temperature} \'C")
             changed = False
             direction = ""
@@ -205,7 +219,7 @@ class FanAddon(Addon):
                 data['spc_fan_power'] = power
             if self.pwm_fan.is_ready():
                 self.pwm_fan.set_state(self.level)
-                data['pwm_fan_speed'] = self.pwm_fan.get_speed()
+                data['pwm_fan_speed'] = self.sample_bus.value('pwm_fan_speed')
 
             if changed:
                 self.log.info(f"set fan level: {FAN_LEVELS[self.level]['name']}")
@@ -218,8 +232,42 @@ class FanAddon(Addon):
         
         self.event.publish('data_changed', data)
         
+    @log_error
+    def publish_speed(self):
+        self.event.publish('data_changed', {'pwm_fan_speed': self.sample_bus.value('pwm_fan_speed')})
+
+    def is_mirroring(self):
+        return self.pwm_fan.is_ready() and self.pwm_fan.is_supported()
+
+    @log_error
+    def on_thermal_event(self, event):
+        if event["event"] == "cdev_state" and event.get("cdev_id") == 0 and self.is_mirroring():
+            self.log.debug(f"Thermal event: {event}")
+            if "state" in event:
+                self.sample_bus.put('pwm_fan_state', event["state"])
+            self.run()
+
     @log_error
     async def _main(self):
+        if self.is_mirroring():
+            # Kernel controls the PWM fan, mirror it to other fans on state changes only
+            self.thermal_events = ThermalEventSource(
+                self.on_thermal_event, poll_interval=self.interval,
+                read_state=lambda: self.sample_bus.value('pwm_fan_state'), log=self.log)
+            events = asyncio.ensure_future(self.thermal_events.run())
+            last_sync = None
+            while self.running and not events.done():
+                now = time.monotonic()
+                if last_sync is None or now - last_sync >= EVENT_RESYNC_INTERVAL:
+                    self.run()
+                    last_sync = now
+                else:
+                    # Fan speed changes without a state change, keep publishing it
+                    self.publish_speed()
+                await asyncio.wait([events], timeout=self.interval)
+            self.thermal_events.stop()
+            await events
+            return
         while self.running:
             self.run()
             await asyncio.sleep(self.interval)
@@ -243,6 +291,8 @@ class FanAddon(Addon):
 
     @log_error
     async def _stop(self):
+        if self.thermal_events:
+            self.thermal_events.stop()
         self.off()
         self.close()
 
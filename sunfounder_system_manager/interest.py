@@ -0,0 +1,79 @@
+import time
+
+# Seconds a subscription stays alive without being renewed
+DEFAULT_LEASE = 30
+
+class InterestTracker():
+    """
+    Track which metric groups have active subscribers
+
+    Clients subscribe to metric groups with a lease and renew it
+    periodically. Groups with no live lease are considered unwanted, so their
+    collectors can be suspended. When disabled, every group is wanted.
+    """
+
+    def __init__(self, enabled=False, lease=DEFAULT_LEASE):
+        self.enabled = enabled
+        self.lease = lease
+        self._leases = {}
+
+    def subscribe(self, client, groups, lease=None):
+        """
+        Add or renew a client's interest in metric groups
+
+        Returns:
+            list: groups that had no interest before
+        """
+        if lease is None:
+            lease = self.lease
+        now = time.monotonic()
+        resumed = []
+        for group in groups:
+            clients = self._leases.setdefault(group, {})
+            if not self._alive(clients, now):
+                resumed.append(group)
+            clients[client] = now + lease
+        return resumed
+
+    def unsubscribe(self, client, groups=None):
+        """
+        Remove a client's interest, from all groups if groups is None
+
+        Returns:
+            list: groups that have no interest anymore
+        """
+        if groups is None:
+            groups = list(self._leases)
+        now = time.monotonic()
+        suspended = []
+        for group in groups:
+            clients = self._leases.get(group)
+            if not clients or client not in clients:
+                continue
+            del clients[client]
+            if not self._alive(clients, now):
+                suspended.append(group)
+        return suspended
+
+    def is_wanted(self, group):
+        """
+        Check if a metric group has at least one live subscriber
+        """
+        if not self.enabled:
+            return True
+        clients = self._leases.get(group)
+        if not clients:
+            return False
+        return self._alive(clients, time.monotonic())
+
+    def wanted_groups(self):
+        now = time.monotonic()
+        return [group for group, clients in self._leases.items() if self._alive(clients, now)]
+
+    @staticmethod
+    def _alive(clients, now):
+        # Drop expired leases while checking
+        for client, expire in list(clients.items()):
+            if expire < now:
+                del clients[client]
+        return len(clients) > 0
@@ -0,0 +1,181 @@
+import os
+import struct
+import subprocess
+import threading
+
+VCIO_PATH = '/dev/vcio'
+
+# _IOWR(100, 0, char *)
+IOCTL_MBOX_PROPERTY = 0xC0000000 | (struct.calcsize('P') << 16) | (100 << 8)
+
+PROCESS_REQUEST = 0x00000000
+REQUEST_SUCCESS = 0x80000000
+TAG_RESPONSE = 0x80000000
+
+# Property tags
+TAG_GET_CLOCK_RATE = 0x00030002
+TAG_GET_VOLTAGE = 0x00030003
+TAG_GET_TEMPERATURE = 0x00030006
+TAG_GET_MAX_TEMPERATURE = 0x0003000A
+TAG_GET_THROTTLED = 0x00030046
+TAG_GET_CLOCK_RATE_MEASURED = 0x00030047
+TAG_GET_GENCMD = 0x00030080
+
+# Clock ids
+CLOCK_ARM = 3
+CLOCK_CORE = 4
+CLOCK_V3D = 5
+CLOCK_SDRAM = 8
+
+# Voltage ids
+VOLTAGE_CORE = 1
+VOLTAGE_SDRAM_C = 2
+VOLTAGE_SDRAM_P = 3
+VOLTAGE_SDRAM_I = 4
+
+GENCMD_BUFFER_SIZE = 1024
+
+class MailboxError(Exception):
+    pass
+
+class VcioTransport():
+    """
+    Mailbox transport over /dev/vcio, kept open between requests
+    """
+
+    def __init__(self, path=VCIO_PATH):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR)
+
+    def property(self, buffer):
+        """
+        Send a property message, the response is written back into buffer
+        """
+        import fcntl
+        fcntl.ioctl(self._fd, IOCTL_MBOX_PROPERTY, buffer, True)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class Mailbox():
+    """
+    VideoCore mailbox property client, replaces forking vcgencmd
+
+    Several property tags can be batched into a single request. The
+    transport is anything with a property(buffer) method, so it can be
+    replaced with a fake device.
+
+    Args:
+        transport: Mailbox transport, opens /dev/vcio if None
+    """
+
+    def __init__(self, transport=None):
+        self.transport = transport or VcioTransport()
+        self._lock = threading.Lock()
+
+    def request(self, tags):
+        """
+        Send a batch of property tags in one mailbox call
+
+        Args:
+            tags (list): [(tag, [u32 args], value buffer size in bytes), ...]
+
+        Returns:
+            list: response value buffer (bytes) of each tag
+        """
+        words = [0, PROCESS_REQUEST]
+        offsets = []
+        for tag, args, size in tags:
+            size = max(size, 4 * len(args))
+            size = (size + 3) & ~3
+            words += [tag, size, 0]
+            offsets.append((len(words) * 4, size))
+            words += list(args) + [0] * (size // 4 - len(args))
+        words.append(0)
+        words[0] = len(words) * 4
+        buffer = bytearray(struct.pack(f'<{len(words)}I', *words))
+
+        with self._lock:
+            self.transport.property(buffer)
+
+        code = struct.unpack_from('<I', buffer, 4)[0]
+        if code != REQUEST_SUCCESS:
+            raise MailboxError(f"Mailbox request failed: 0x{code:08x}")
+        values = []
+        for (offset, size), (tag, _, _) in zip(offsets, tags):
+            status = struct.unpack_from('<I', buffer, offset - 4)[0]
+            if not status & TAG_RESPONSE:
+                raise MailboxError(f"Mailbox tag 0x{tag:08x} not answered")
+            length = min(status & ~TAG_RESPONSE, size)
+            values.append(bytes(buffer[offset:offset + length]))
+        return values
+
+    @staticmethod
+    def unpack(value, index=0):
+        return struct.unpack_from('<I', value, index * 4)[0]
+
+    def get_temperature(self):
+        """
+        Get SoC temperature in °C
+        """
+        value, = self.request([(TAG_GET_TEMPERATURE, [0], 8)])
+        return self.unpack(value, 1) / 1000
+
+    def get_throttled(self):
+        """
+        Get throttled state bits, same as vcgencmd get_throttled
+        """
+        value, = self.request([(TAG_GET_THROTTLED, [0xFFFF], 4)])
+        return self.unpack(value)
+
+    def get_clock_rate(self, clock_id, measured=True):
+        """
+        Get clock rate in Hz
+        """
+        tag = TAG_GET_CLOCK_RATE_MEASURED if measured else TAG_GET_CLOCK_RATE
+        value, = self.request([(tag, [clock_id], 8)])
+        return self.unpack(value, 1)
+
+    def get_voltage(self, voltage_id):
+        """
+        Get voltage in V
+        """
+        value, = self.request([(TAG_GET_VOLTAGE, [voltage_id], 8)])
+        return self.unpack(value, 1) / 1000000
+
+    def gencmd(self, command):
+        """
+        Run a firmware command without forking vcgencmd, e.g. "pmic_read_adc"
+
+        Returns:
+            str: command output
+        """
+        encoded = command.encode() + b'\0'
+        if len(encoded) > GENCMD_BUFFER_SIZE - 4:
+            raise ValueError(f"Command too long: {command}")
+        args = [0] + list(struct.unpack(f'<{(len(encoded) + 3) // 4}I', encoded.ljust((len(encoded) + 3) & ~3, b'\0')))
+        value, = self.request([(TAG_GET_GENCMD, args, GENCMD_BUFFER_SIZE)])
+        error = self.unpack(value)
+        if error:
+            raise MailboxError(f"gencmd {command} failed: {error}")
+        return value[4:].split(b'\0', 1)[0].decode(errors='replace').strip()
+
+    def close(self):
+        if hasattr(self.transport, 'close'):
+            self.transport.close()
+
+def vcgencmd_get_throttled():
+    """
+    Get throttled state bits by running vcgencmd, fallback when the mailbox
+    is not available
+
+    Returns:
+        int: Throttled bits, None if vcgencmd failed
+    """
+    try:
+        output = subprocess.check_output(['vcgencmd', 'get_throttled'], timeout=2).decode()
+        return int(output.strip().split('=', 1)[1], 16)
+    except (OSError, subprocess.SubprocessError, IndexError, ValueError):
+        return None
@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+import time
+
+from .status_server import SOCKET_PATH, request_status
+
+def sample_status():
+    """
+    Sample the main metrics directly, used when the daemon is not running
+    """
+    from sf_rpi_status import (
+        get_cpu_temperature, get_cpu_percent, get_cpu_freq, get_cpu_count,
+        get_memory_info, get_disks_info, get_boot_time, get_ips,
+    )
+    data = {}
+    data["cpu_temperature"] = get_cpu_temperature()
+    data["cpu_count"] = int(get_cpu_count())
+    data["cpu_percent"] = float(get_cpu_percent())
+    data["cpu_freq_current"] = float(get_cpu_freq().current)
+    memory = get_memory_info()
+    data["memory_total"] = int(memory.total)
+    data["memory_available"] = int(memory.available)
+    data["memory_percent"] = float(memory.percent)
+    for name, addr in get_ips().items():
+        data[f"ip_{name}"] = addr
+    for disk_name, disk in get_disks_info().items():
+        data[f"disk_{disk_name}_used"] = int(disk.used)
+        data[f"disk_{disk_name}_percent"] = float(disk.percent)
+    data["boot_time"] = float(get_boot_time())
+
+    now = time.time()
+    return {
+        "timestamp": now,
+        "metrics": {key: {"value": value, "timestamp": now} for key, value in data.items()},
+    }
+
+def format_table(snapshot):
+    metrics = snapshot["metrics"]
+    if not metrics:
+        return ""
+    width = max(len(key) for key in metrics)
+    lines = [f"{'KEY':<{width}}  {'AGE':>6}  VALUE"]
+    for key in sorted(metrics):
+        age = snapshot["timestamp"] - metrics[key]["timestamp"]
+        lines.append(f"{key:<{width}}  {age:>5.1f}s  {metrics[key]['value']}")
+    return "\n".join(lines)
+
+def status(argv):
+    parser = argparse.ArgumentParser(
+        prog="sunfounder-system-manager status",
+        description="Show the status cached by the running system manager")
+    parser.add_argument("keys", nargs="*", help="Only show these keys")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Daemon status socket path")
+    parser.add_argument("--no-fallback", action="store_true",
+                        help="Fail instead of sampling directly if the daemon is not running")
+    args = parser.parse_args(argv)
+
+    keys = args.keys or None
+    try:
+        snapshot = request_status(keys, path=args.socket)
+        snapshot["source"] = "daemon"
+    except (OSError, ValueError) as e:
+        # ValueError: empty or truncated reply from the daemon
+        if args.no_fallback:
+            print(f"System manager not running: {e}", file=sys.stderr)
+            return 1
+        snapshot = sample_status()
+        snapshot["source"] = "direct"
+        if keys:
+            snapshot["metrics"] = {key: value for key, value in snapshot["metrics"].items() if key in keys}
+
+    if args.json:
+        print(json.dumps(snapshot))
+    else:
+        print(format_table(snapshot))
+    return 0
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        sys.exit(status(sys.argv[2:]))
+
+    # Load the daemon only when running it, keeps the status command fast
+    from sunfounder_service_node.service_node import create_luancher
+    from .system_manager import SystemManager
+    launcher = create_luancher(SystemManager, "system_manager", "SunFounder System manager")
+    return launcher()
@@ -0,0 +1,158 @@
+import time
+from array import array
+from fnmatch import fnmatch
+
+PROC_NET_DEV = '/proc/net/dev'
+
+# Interfaces skipped unless explicitly included
+DEFAULT_EXCLUDE = ['lo', 'docker*', 'br-*', 'veth*']
+
+# Column index of each counter in /proc/net/dev
+RX_BYTES = 0
+RX_PACKETS = 1
+RX_ERRORS = 2
+RX_DROPS = 3
+TX_BYTES = 8
+TX_PACKETS = 9
+TX_ERRORS = 10
+TX_DROPS = 11
+FIELD_COUNT = 16
+
+def _new_counters():
+    return array('Q', bytes(8 * FIELD_COUNT))
+
+def _delta(current, last, index):
+    # Counters reset when an interface goes down and up again
+    value = current[index] - last[index]
+    return value if value > 0 else 0
+
+class NetworkInterfaceCollector():
+    """
+    Per-interface network rates, errors and drops from /proc/net/dev
+    """
+
+    def __init__(self, include=None, exclude=None, path=PROC_NET_DEV, log=None):
+        self.path = path
+        self.log = log
+        self.include = []
+        self.exclude = []
+        self._selected = {}
+        self._current = {}
+        self._last = {}
+        self._last_time = None
+        self._file = None
+        self.set_filter(include, exclude)
+
+    def set_filter(self, include=None, exclude=None):
+        """
+        Set interface name patterns to include or exclude, fnmatch style.
+        An empty include list means all interfaces.
+        """
+        self.include = list(include) if include else []
+        self.exclude = list(DEFAULT_EXCLUDE if exclude is None else exclude)
+        self._selected.clear()
+
+    def is_selected(self, name):
+        """
+        Check if an interface passes the include/exclude filter
+        """
+        selected = self._selected.get(name)
+        if selected is None:
+            selected = not self.include or any(fnmatch(name, p) for p in self.include)
+            if selected and any(fnmatch(name, p) for p in self.exclude):
+                selected = False
+            self._selected[name] = selected
+        return selected
+
+    def _read(self):
+        # Keep the file open, procfs regenerates the content on every read from 0
+        if self._file is None:
+            self._file = open(self.path, 'r')
+        else:
+            self._file.seek(0)
+        return self._file.read()
+
+    def collect(self):
+        """
+        Sample all counters once and return rates since the last call
+
+        Returns:
+            dict: flat data dict ready to publish
+        """
+        try:
+            content = self._read()
+        except OSError as e:
+            if self.log:
+                self.log.error(f'read {self.path} error: {e}')
+            self.close()
+            return {}
+
+        now = time.monotonic()
+        interval = now - self._last_time if self._last_time is not None else 0
+        self._last_time = now
+
+        data = {}
+        names = []
+        seen = []
+        for line in content.splitlines()[2:]:
+            name, sep, values = line.partition(':')
+            name = name.strip()
+            if not sep:
+                continue
+            seen.append(name)
+            if not self.is_selected(name):
+                continue
+            names.append(name)
+
+            current = self._current.get(name)
+            if current is None:
+                current = _new_counters()
+                self._current[name] = current
+            for i, value in enumerate(values.split()[:FIELD_COUNT]):
+                current[i] = int(value)
+
+            last = self._last.get(name)
+            if last is not None and interval > 0:
+                prefix = f'network_{name}'
+                data[f'{prefix}_upload'] = int(_delta(current, last, TX_BYTES) / interval)
+                data[f'{prefix}_download'] = int(_delta(current, last, RX_BYTES) / interval)
+                data[f'{prefix}_tx_packets'] = int(_delta(current, last, TX_PACKETS) / interval)
+                data[f'{prefix}_rx_packets'] = int(_delta(current, last, RX_PACKETS) / interval)
+                data[f'{prefix}_tx_errors'] = int(current[TX_ERRORS])
+                data[f'{prefix}_rx_errors'] = int(current[RX_ERRORS])
+                data[f'{prefix}_tx_drops'] = int(current[TX_DROPS])
+                data[f'{prefix}_rx_drops'] = int(current[RX_DROPS])
+            if last is None:
+                last = _new_counters()
+            # Swap buffers instead of allocating new ones every tick
+            self._last[name] = current
+            self._current[name] = last
+
+        # Forget interfaces that disappeared
+        if len(names) != len(self._last):
+            for name in list(self._last):
+                if name not in names:
+                    del self._last[name]
+                    del self._current[name]
+        # Filter results too, excluded ones included, e.g. a veth per container start
+        if len(seen) != len(self._selected):
+            for name in list(self._selected):
+                if name not in seen:
+                    del self._selected[name]
+
+        data['network_interfaces'] = names
+        return data
+
+    def reset(self):
+        """
+        Forget the last sample, so the first rate after a pause is not
+        computed over the whole pause
+        """
+        self._last.clear()
+        self._current.clear()
+        self._last_time = None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
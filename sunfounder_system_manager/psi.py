@@ -0,0 +1,152 @@
+import asyncio
+import os
+import select
+
+PRESSURE_DIR = 'proc/pressure'
+RESOURCES = ('cpu', 'memory', 'io')
+
+# Default kernel triggers: 150ms of stall within any 1s window
+DEFAULT_TRIGGERS = [
+    {"resource": "memory", "type": "some", "stall_ms": 150, "window_ms": 1000},
+    {"resource": "io", "type": "full", "stall_ms": 150, "window_ms": 1000},
+]
+
+def parse_pressure(content):
+    """
+    Parse a /proc/pressure file
+
+    Returns:
+        dict: {"some": {"avg10": 0.0, "avg60": 0.0, "avg300": 0.0, "total": 0}, "full": {...}}
+    """
+    result = {}
+    for line in content.splitlines():
+        kind, *fields = line.split()
+        values = {}
+        for field in fields:
+            key, _, value = field.partition('=')
+            values[key] = int(value) if key == 'total' else float(value)
+        result[kind] = values
+    return result
+
+class PsiCollector():
+    """
+    Pressure Stall Information from /proc/pressure
+    """
+
+    def __init__(self, root='/', resources=RESOURCES, log=None):
+        self.pressure_dir = os.path.join(root, PRESSURE_DIR)
+        self.resources = resources
+        self.log = log
+        self._files = {}
+
+    def is_supported(self):
+        return os.path.isdir(self.pressure_dir)
+
+    def _read(self, resource):
+        f = self._files.get(resource)
+        if f is None:
+            f = open(os.path.join(self.pressure_dir, resource), 'r')
+            self._files[resource] = f
+        else:
+            f.seek(0)
+        return f.read()
+
+    def collect(self):
+        """
+        Returns:
+            dict: flat data dict, e.g. {"psi_memory_some_avg10": 0.0, ...}
+        """
+        data = {}
+        for resource in self.resources:
+            try:
+                pressure = parse_pressure(self._read(resource))
+            except OSError as e:
+                if self.log:
+                    self.log.debug(f"Read pressure {resource} error: {e}")
+                continue
+            for kind, values in pressure.items():
+                prefix = f'psi_{resource}_{kind}'
+                data[f'{prefix}_avg10'] = values.get('avg10', 0.0)
+                data[f'{prefix}_avg60'] = values.get('avg60', 0.0)
+                data[f'{prefix}_total'] = values.get('total', 0)
+        return data
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+class PsiTriggers():
+    """
+    Kernel PSI triggers, report stalls as soon as they happen
+
+    Each trigger is a pressure file with a threshold written to it, the
+    kernel signals POLLPRI when the stall time within the window exceeds the
+    threshold. All triggers share one epoll, watched by the event loop.
+    callback(trigger) is called on the event loop with the trigger config.
+    """
+
+    def __init__(self, callback, root='/', log=None):
+        self.callback = callback
+        self.pressure_dir = os.path.join(root, PRESSURE_DIR)
+        self.log = log
+        self._epoll = None
+        self._triggers = {}
+        self._loop = None
+
+    def start(self, triggers=DEFAULT_TRIGGERS, loop=None):
+        """
+        Register triggers, must be called from the event loop thread
+
+        Returns:
+            int: number of triggers registered
+        """
+        self.stop()
+        self._epoll = select.epoll()
+        for trigger in triggers:
+            path = os.path.join(self.pressure_dir, trigger["resource"])
+            try:
+                fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+            except OSError as e:
+                if self.log:
+                    self.log.warning(f"Open {path} for PSI trigger failed: {e}")
+                continue
+            try:
+                os.write(fd, f'{trigger["type"]} {trigger["stall_ms"] * 1000} {trigger["window_ms"] * 1000}\0'.encode())
+                self._epoll.register(fd, select.EPOLLPRI)
+            except OSError as e:
+                if self.log:
+                    self.log.warning(f"Register PSI trigger {trigger} failed: {e}")
+                os.close(fd)
+                continue
+            self._triggers[fd] = trigger
+        if not self._triggers:
+            self.stop()
+            return 0
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop.add_reader(self._epoll.fileno(), self._on_readable)
+        return len(self._triggers)
+
+    def _on_readable(self):
+        for fd, events in self._epoll.poll(0):
+            trigger = self._triggers.get(fd)
+            if trigger is None:
+                continue
+            if events & select.EPOLLERR:
+                # Pressure file gone, e.g. the cgroup was removed
+                self._epoll.unregister(fd)
+                os.close(fd)
+                del self._triggers[fd]
+            elif events & select.EPOLLPRI:
+                self.callback(trigger)
+
+    def stop(self):
+        if self._loop is not None and self._epoll is not None:
+            self._loop.remove_reader(self._epoll.fileno())
+            self._loop = None
+        for fd in self._triggers:
+            os.close(fd)
+        self._triggers = {}
+        if self._epoll is not None:
+            self._epoll.close()
+            self._epoll = None
@@ -1,4 +1,6 @@
 import os
+import logging
+import subprocess
 from enum import StrEnum
 from sunfounder_service_node.configtxt import ConfigTxt
 
@@ -23,6 +25,8 @@ FAN_LEVELS = {
     }
 }
 
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0'
+
 class FanMode(StrEnum):
     """
     PWM fan mode
@@ -37,6 +41,11 @@ class PWMFan():
     """
     INTERVAL = 1
 
+    def __init__(self, log=None, thermal_zone=THERMAL_ZONE):
+        self.log = log or logging.getLogger(__name__)
+        self.thermal_zone = thermal_zone
+        self._persisted_mode = None
+
     @staticmethod
     def is_supported():
         """
@@ -91,14 +100,77 @@ class PWMFan():
             self.log.error(f'read fan1 speed error: {e}')
             return 0
 
+    def get_active_trip_points(self):
+        """
+        Get the active trip points of the thermal zone driving the fan
+
+        Returns:
+            list: [(index, temperature), ...] sorted by temperature
+        """
+        trips = []
+        index = 0
+        while True:
+            prefix = f'{self.thermal_zone}/trip_point_{index}'
+            try:
+                with open(f'{prefix}_type', 'r') as f:
+                    trip_type = f.read().strip()
+            except FileNotFoundError:
+                break
+            if trip_type == 'active':
+                with open(f'{prefix}_temp', 'r') as f:
+                    trips.append((index, int(f.read())))
+            index += 1
+        trips.sort(key=lambda trip: trip[1])
+        return trips
+
+    def apply_trip_points(self, mode: FanMode):
+        """
+        Apply a fan curve at runtime by writing the thermal zone trip points,
+        only the ones that differ are written
+
+        Returns:
+            bool: True if the running kernel now uses the curve
+        """
+        temps = [value for _, value in sorted(FAN_LEVELS[mode].items())]
+        try:
+            trips = self.get_active_trip_points()
+        except (OSError, ValueError) as e:
+            self.log.error(f'read trip points error: {e}')
+            return False
+        if len(trips) < len(temps):
+            self.log.warning(f'Expected {len(temps)} active trip points, found {len(trips)}')
+            return False
+
+        changes = [(index, temp) for (index, current), temp in zip(trips, temps) if current != temp]
+        # Keep trip points ordered while writing: raise from the top, lower from the bottom
+        if changes and temps[0] > trips[0][1]:
+            changes.reverse()
+        try:
+            for index, temp in changes:
+                with open(f'{self.thermal_zone}/trip_point_{index}_temp', 'w') as f:
+                    f.write(str(temp))
+        except OSError as e:
+            self.log.warning(f'write trip points error, new fan mode applies after reboot: {e}')
+            return False
+        return True
+
     def set_mode(self, mode: FanMode):
         """
-        Set PWM fan mode
+        Set PWM fan mode, applied immediately and persisted to config.txt
         """
+        mode = FanMode(mode)
+        self.apply_trip_points(mode)
+        if mode == self._persisted_mode:
+            return
         config = ConfigTxt()
+        changed = False
         for name, value in FAN_LEVELS[mode].items():
-            config.set_dt_param(name, str(value))
-        config.save()
+            if config.get_dt_param(name) != str(value):
+                config.set_dt_param(name, str(value))
+                changed = True
+        if changed:
+            config.save()
+        self._persisted_mode = mode
 
     def close(self):
         pass
\ No newline at end of file
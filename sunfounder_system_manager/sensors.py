@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import namedtuple
+
+CPU_TEMPERATURE_PATH = '/sys/class/thermal/thermal_zone0/temp'
+
+# value: sensor reading, timestamp: wall clock time it was read at
+Sample = namedtuple('Sample', ['value', 'timestamp', 'monotonic'])
+
+class SampleBus():
+    """
+    Share sensor readings between consumers
+
+    Each registered sensor is read at most once per tick, every consumer
+    asking within the same tick gets the same timestamped sample. Consumers
+    on independent loops with the same period therefore share one read.
+
+    Args:
+        tick (float): Tick length in seconds
+    """
+
+    # Part of a tick a sample stays fresh for, leaves room for loop jitter
+    FRESHNESS = 0.9
+
+    def __init__(self, tick=1):
+        self.tick = tick
+        self._readers = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, reader, replace=False):
+        """
+        Register a sensor reader function
+
+        Args:
+            name (str): Sensor name, e.g. "cpu_temperature"
+            reader (callable): Function returning the current value
+            replace (bool): Replace an existing reader with the same name
+
+        Returns:
+            bool: True if registered
+        """
+        with self._lock:
+            if name in self._readers and not replace:
+                return False
+            self._readers[name] = reader
+            self._samples.pop(name, None)
+            return True
+
+    def unregister(self, name):
+        with self._lock:
+            self._readers.pop(name, None)
+            self._samples.pop(name, None)
+
+    def has(self, name):
+        return name in self._readers
+
+    def put(self, name, value):
+        """
+        Store a value obtained elsewhere, e.g. from a kernel event, as this
+        tick's sample so consumers don't read a stale one
+
+        Returns:
+            Sample: The stored sample
+        """
+        with self._lock:
+            sample = Sample(value, time.time(), time.monotonic())
+            self._samples[name] = sample
+            return sample
+
+    def read(self, name):
+        """
+        Get the sample of this tick, reading the sensor if there is none yet
+
+        Returns:
+            Sample: The sample, None if no reader registered
+        """
+        with self._lock:
+            reader = self._readers.get(name)
+            if reader is None:
+                return None
+            now = time.monotonic()
+            sample = self._samples.get(name)
+            if sample is None or now - sample.monotonic >= self.tick * self.FRESHNESS:
+                sample = Sample(reader(), time.time(), now)
+                self._samples[name] = sample
+            return sample
+
+    def value(self, name, default=None):
+        """
+        Get the value of this tick's sample
+        """
+        sample = self.read(name)
+        if sample is None:
+            return default
+        return sample.value
+
+def read_cpu_temperature():
+    """
+    Canonical CPU temperature reader, every consumer registers this one so
+    they all get the same value whichever registers first
+
+    Returns:
+        float: Temperature in °C rounded to 2 decimals, None if it can't be read
+    """
+    try:
+        with open(CPU_TEMPERATURE_PATH, 'r') as f:
+            return round(int(f.read()) / 1000, 2)
+    except (OSError, ValueError):
+        return None
+
+# Shared by every consumer in the process
+default_bus = SampleBus()
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+# Seconds to wait for participants before shutting down anyway
+DEFAULT_DEADLINE = 5
+
+class ShutdownCoordinator():
+    """
+    Wait asynchronously for registered participants to acknowledge a shutdown
+
+    Participants register once, then acknowledge each shutdown request after
+    they finished flushing. The shutdown callback runs as soon as all
+    participants acked, or when the deadline passes. With no participant
+    registered it waits for the whole deadline, so subscribers unaware of the
+    acknowledgement still get time to clean up.
+
+    All methods except start() must be called from the event loop thread, use
+    the *_threadsafe() variants from other threads.
+    """
+
+    def __init__(self, callback, deadline=DEFAULT_DEADLINE, log=None):
+        self.callback = callback
+        self.deadline = deadline
+        self.log = log
+        self.participants = set()
+        self._pending = set()
+        self._done = None
+        self._task = None
+        self._loop = None
+
+    def start(self, loop=None):
+        """
+        Bind to an event loop, the running one by default
+        """
+        self._loop = loop or asyncio.get_running_loop()
+
+    def register(self, participant):
+        self.participants.add(participant)
+
+    def unregister(self, participant):
+        self.participants.discard(participant)
+        self.ack(participant)
+
+    def register_threadsafe(self, participant):
+        self._call_threadsafe(self.register, participant)
+
+    def unregister_threadsafe(self, participant):
+        self._call_threadsafe(self.unregister, participant)
+
+    def _call_threadsafe(self, method, *args):
+        if self._loop is None:
+            # Event loop not started yet, no other thread uses the state
+            method(*args)
+        else:
+            self._loop.call_soon_threadsafe(method, *args)
+
+    @property
+    def in_progress(self):
+        return self._task is not None and not self._task.done()
+
+    def request(self, deadline=None):
+        """
+        Start waiting for acknowledgements, ignored if already in progress
+
+        Returns:
+            bool: True if a new shutdown sequence started
+        """
+        if self.in_progress:
+            return False
+        self._pending = set(self.participants)
+        self._done = asyncio.Event()
+        self._task = self._loop.create_task(self._run(self.deadline if deadline is None else deadline))
+        return True
+
+    def request_threadsafe(self, deadline=None):
+        if self._loop is None:
+            # Event loop not started yet, nothing to wait on
+            self.callback()
+            return
+        self._loop.call_soon_threadsafe(self.request, deadline)
+
+    def ack(self, participant):
+        if participant in self._pending:
+            self._pending.discard(participant)
+            if not self._pending and self._done is not None:
+                self._done.set()
+
+    def ack_threadsafe(self, participant):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.ack, participant)
+
+    async def _run(self, deadline):
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._done.wait(), deadline)
+            if self.log:
+                self.log.info(f"All shutdown participants acked in {time.monotonic() - start:.2f}s")
+        except asyncio.TimeoutError:
+            if self.log and self._pending:
+                self.log.warning(f"Shutdown participants not acked after {deadline}s: {sorted(self._pending)}")
+        finally:
+            self.callback()
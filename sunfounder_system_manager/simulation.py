@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import random
+
+from .system_manager import SystemManager
+from .trace import TraceReplayer, load_trace
+
+class SimulatedSystemManager(SystemManager):
+    """
+    System manager node without real hardware, for load-testing consumers
+
+    With a trace, the node replays recorded published data instead of
+    collecting. Without one, it collects as usual, with the collectors that
+    read procfs/sysfs directly reading from the fake root.
+
+    Args:
+        trace (list): Trace entries from load_trace, can be shared between nodes
+        speed (float): Replay speed, 1 to 100
+    """
+
+    def __init__(self, *args, trace=None, speed=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replayer = None
+        if trace:
+            offset = random.randrange(len(trace))
+            self.replayer = TraceReplayer(trace, speed=speed, offset=offset)
+
+    def on_peripherals_changed(self, peripherals):
+        # No power button or fan on a simulated node
+        pass
+
+    def on_start(self) -> None:
+        if self.replayer is None:
+            super().on_start()
+
+    async def main(self) -> None:
+        if self.replayer is None:
+            await super().main()
+        else:
+            await self.replayer.play(self.publish_data)
+
+async def run_nodes(nodes):
+    """
+    Run many nodes concurrently on the current event loop
+    """
+    for node in nodes:
+        node.on_start()
+    try:
+        await asyncio.gather(*(node.main() for node in nodes))
+    finally:
+        for node in nodes:
+            node.on_stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run simulated SunFounder system manager nodes")
+    parser.add_argument("--nodes", type=int, default=1, help="Number of simulated nodes")
+    parser.add_argument("--trace", help="Trace file recorded with trace_record_path")
+    parser.add_argument("--speed", type=float, default=1, help="Replay speed, 1 to 100")
+    parser.add_argument("--root", default="/", help="Fake procfs/sysfs root directory")
+    args = parser.parse_args()
+
+    if not 1 <= args.speed <= 100:
+        parser.error("speed must be between 1 and 100")
+    trace = load_trace(args.trace) if args.trace else None
+    nodes = [
+        SimulatedSystemManager(
+            node_id=f"system-manager-sim-{i}",
+            root=args.root,
+            trace=trace,
+            speed=args.speed,
+        )
+        for i in range(args.nodes)
+    ]
+    asyncio.run(run_nodes(nodes))
+
+if __name__ == "__main__":
+    main()
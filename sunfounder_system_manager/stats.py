@@ -0,0 +1,208 @@
+import math
+import time
+from collections import deque
+from fnmatch import fnmatch
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+class QuantileSketch():
+    """
+    Log-bucketed quantile sketch supporting insertion and removal
+
+    Values are counted in buckets growing by a constant ratio, so any
+    quantile is answered within the given relative accuracy, whatever the
+    range of the metric.
+    """
+
+    def __init__(self, accuracy=0.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._positive = {}
+        self._negative = {}
+        self._zero = 0
+        self.count = 0
+
+    def _bucket(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index):
+        # Middle of the bucket, within accuracy of every value in it
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _change(self, value, delta):
+        self.count += delta
+        if value > 0:
+            buckets = self._positive
+        elif value < 0:
+            buckets = self._negative
+            value = -value
+        else:
+            self._zero += delta
+            return
+        index = self._bucket(value)
+        count = buckets.get(index, 0) + delta
+        if count:
+            buckets[index] = count
+        else:
+            del buckets[index]
+
+    def add(self, value):
+        self._change(value, 1)
+
+    def remove(self, value):
+        self._change(value, -1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self._negative, reverse=True):
+            seen += self._negative[index]
+            if seen > rank:
+                return -self._value(index)
+        seen += self._zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self._positive):
+            seen += self._positive[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self._positive))
+
+class WindowStats():
+    """
+    Sliding time window statistics of one metric
+
+    Mean/variance (Welford), min/max (monotonic queues) and the quantile
+    sketch are all maintained in amortised O(1) per sample.
+    """
+
+    def __init__(self, window=60, accuracy=0.01):
+        self.window = window
+        self._samples = deque()
+        self._min = deque()
+        self._max = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.sketch = QuantileSketch(accuracy)
+
+    def add(self, value, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self._samples.append((timestamp, value))
+        n = len(self._samples)
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+        while self._min and self._min[-1][1] > value:
+            self._min.pop()
+        self._min.append((timestamp, value))
+        while self._max and self._max[-1][1] < value:
+            self._max.pop()
+        self._max.append((timestamp, value))
+        self.sketch.add(value)
+        self.expire(timestamp)
+
+    def expire(self, now=None):
+        """
+        Drop samples older than the window
+        """
+        if now is None:
+            now = time.monotonic()
+        limit = now - self.window
+        while self._samples and self._samples[0][0] <= limit:
+            _, value = self._samples.popleft()
+            n = len(self._samples)
+            if n == 0:
+                self._mean = 0.0
+                self._m2 = 0.0
+            else:
+                delta = value - self._mean
+                self._mean -= delta / n
+                self._m2 -= delta * (value - self._mean)
+            self.sketch.remove(value)
+        while self._min and self._min[0][0] <= limit:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= limit:
+            self._max.popleft()
+
+    @property
+    def count(self):
+        return len(self._samples)
+
+    def summary(self, quantiles=DEFAULT_QUANTILES):
+        """
+        Get the statistics of the current window
+
+        Returns:
+            dict: {"count", "min", "max", "mean", "stddev", "p50", ...}, None if empty
+        """
+        n = len(self._samples)
+        if n == 0:
+            return None
+        result = {
+            "count": n,
+            "min": self._min[0][1],
+            "max": self._max[0][1],
+            "mean": self._mean,
+            "stddev": math.sqrt(max(self._m2, 0) / n),
+        }
+        for q in quantiles:
+            result[f"p{round(q * 100):g}"] = self.sketch.quantile(q)
+        return result
+
+class MetricRollup():
+    """
+    Maintain window statistics for published metrics matching patterns
+
+    Args:
+        metrics (list): Metric key patterns, fnmatch style
+        window (float): Window length in seconds
+    """
+
+    def __init__(self, metrics, window=60, quantiles=DEFAULT_QUANTILES):
+        self.metrics = list(metrics)
+        self.window = window
+        self.quantiles = quantiles
+        self._stats = {}
+        self._matched = {}
+
+    def is_tracked(self, key):
+        matched = self._matched.get(key)
+        if matched is None:
+            matched = any(fnmatch(key, pattern) for pattern in self.metrics)
+            self._matched[key] = matched
+        return matched
+
+    def add(self, data, timestamp=None):
+        """
+        Feed a published data dict, untracked or non-numeric values are ignored
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        for key, value in data.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if not self.is_tracked(key):
+                continue
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = WindowStats(self.window)
+                self._stats[key] = stats
+            stats.add(value, timestamp)
+
+    def rollup(self):
+        """
+        Get the flat rollup dict, e.g. {"cpu_temperature_max": 61.2, ...}
+        """
+        now = time.monotonic()
+        data = {}
+        for key, stats in self._stats.items():
+            stats.expire(now)
+            summary = stats.summary(self.quantiles)
+            if summary is None:
+                continue
+            for name, value in summary.items():
+                data[f"{key}_{name}"] = value
+        return data
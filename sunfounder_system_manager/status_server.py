@@ -0,0 +1,80 @@
+import json
+import os
+import socket
+import socketserver
+import threading
+
+SOCKET_PATH = '/run/sunfounder-system-manager.sock'
+
+class StatusServer():
+    """
+    Serve the cached snapshot on a Unix domain socket
+
+    A client connects, optionally sends a JSON request like {"keys": [...]}
+    followed by a newline, and reads one JSON document until EOF.
+
+    Args:
+        snapshot (callable): snapshot(keys) returning the snapshot dict
+    """
+
+    def __init__(self, snapshot, path=SOCKET_PATH, log=None):
+        self.snapshot = snapshot
+        self.path = path
+        self.log = log
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                keys = None
+                line = self.rfile.readline(65536).strip()
+                if line:
+                    try:
+                        keys = json.loads(line).get("keys")
+                    except (ValueError, AttributeError):
+                        pass
+                    if not (isinstance(keys, list) and all(isinstance(key, str) for key in keys)):
+                        keys = None
+                self.wfile.write(json.dumps(server.snapshot(keys)).encode())
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.path, 0o666)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        if self.log:
+            self.log.debug(f"Status socket listening on {self.path}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+def request_status(keys=None, path=SOCKET_PATH, timeout=1):
+    """
+    Get the snapshot from a running daemon
+
+    Raises:
+        OSError: if the daemon is not running
+        ValueError: if the reply is not valid JSON
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps({"keys": keys}).encode() + b'\n')
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks))
@@ -1,11 +1,14 @@
 from sunfounder_service_node import ServiceNode
 from sunfounder_service_node.lazy_caller import LazyCaller
+import asyncio
+import os
+import re
 import time
 from typing import Dict, Any
 
 # 导入系统监控相关函数
 from sf_rpi_status import (
-    get_cpu_temperature, get_gpu_temperature, get_cpu_percent,
+    get_gpu_temperature, get_cpu_percent,
     get_cpu_freq, get_cpu_count, get_memory_info, get_disks,
     get_disks_info, get_boot_time, get_ips, get_macs,
     get_network_connection_type, get_network_speed, shutdown
@@ -13,24 +16,131 @@ from sf_rpi_status import (
 
 from .pi5_power_button import Pi5PowerButton, ButtonStatus
 from .pwm_fan import FanMode, PWMFan
+from .network import NetworkInterfaceCollector
+from .cache import MetricCache
+from .interest import InterestTracker
+from .trace import TraceRecorder
+from .exporter import OpenMetricsExporter
+from .stats import MetricRollup
+from .shutdown import ShutdownCoordinator
+from .sensors import default_bus, read_cpu_temperature
+from .cpufreq import CpuProfileManager, AutoProfile, PROFILES, AUTO
+from .debug import DebugHooks
+from .alerts import AlertEngine
+from .thermal_events import ThermalEventSource
+from .cgroups import CgroupCollector
+from .status_server import StatusServer
+from .disk_temperature import DiskTemperatureEngine
+from .psi import PsiCollector, PsiTriggers, DEFAULT_TRIGGERS
+from .mailbox import Mailbox, MailboxError, TAG_GET_TEMPERATURE, TAG_GET_THROTTLED, vcgencmd_get_throttled
+
+# 强制刷新同一任务组的最小间隔（秒）
+REFRESH_MIN_INTERVAL = 1
+
+# 滑动窗口统计的默认配置
+DEFAULT_ROLLUP_INTERVAL = 60
+DEFAULT_ROLLUP_METRICS = ["cpu_temperature", "gpu_temperature", "cpu_percent", "memory_percent"]
+
+# 指标键前缀对应的采集组，告警规则依赖的组会一直采集
+METRIC_GROUPS = [
+    ("cpu_temperature", "cpu_temperature"),
+    ("gpu_temperature", "gpu_temperature"),
+    ("throttled", "throttle"),
+    ("cpu_", "cpu"),
+    ("memory_", "memory"),
+    ("network_", "network"),
+    ("psi_", "pressure"),
+    ("pwm_fan_", "pwm_fan"),
+    ("disk_", "storage"),
+    ("cgroup_", "cgroups"),
+    ("ip_", "ip_address"),
+]
+# 告警规则在按需采集中的内部订阅者
+ALERTS_CLIENT = "system-manager/alerts"
+
+def metric_groups(metric: str) -> set:
+    """指标键或 fnmatch 模式可能属于的采集组，以通配符开头的模式属于所有组"""
+    literal = re.split(r'[*?\[]', metric, 1)[0]
+    if literal == metric:
+        # 具体指标只属于第一个匹配的组，列表中较具体的前缀在前
+        for prefix, group in METRIC_GROUPS:
+            if metric.startswith(prefix):
+                return {group}
+        return set()
+    return {group for prefix, group in METRIC_GROUPS if prefix.startswith(literal) or literal.startswith(prefix)}
+
+def is_str_list(value) -> bool:
+    """检查是否为字符串列表，用于校验命令参数"""
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
 
 class SystemManager(ServiceNode):
     """树莓派系统监控节点，基于新的ServiceNode核心库实现"""
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, node_id="system-manager", root="/", **kwargs):
         # 配置节点基础信息
-        node_id = "system-manager"
+        # root: procfs/sysfs 根目录，模拟节点可指向测试夹具目录
         super().__init__(node_id, *args, **kwargs)
+        self.root = root
         self.power_button = None
-        self.pwm_fan
+        self.pwm_fan = None
+        # 与风扇控制共享的传感器采样，每个传感器每个周期只读一次
+        self.sample_bus = default_bus
+        self.sample_bus.register("cpu_temperature", read_cpu_temperature)
+        self.network_collector = NetworkInterfaceCollector(
+            path=os.path.join(root, "proc/net/dev"), log=self.log)
+        self.metric_cache = MetricCache()
+        self.interest = InterestTracker()
+        self.trace_recorder = None
+        self.exporter = None
+        self.shutdown_coordinator = ShutdownCoordinator(self.do_shutdown, log=self.log)
+        self.cpu_profile = CpuProfileManager(root=root, log=self.log)
+        self.auto_profile = None
+        self.cpu_profile_link_fan = False
+        self.pwm_fan_mode = None
+        self.debug_hooks = DebugHooks(log=self.log)
+        self.alert_engine = AlertEngine()
+        self.thermal_events = None
+        self.cgroup_collector = CgroupCollector(root=root, log=self.log)
+        self.disk_temperature = DiskTemperatureEngine(log=self.log)
+        self.psi_collector = PsiCollector(root=root, log=self.log)
+        self.psi_triggers = PsiTriggers(self.handle_pressure_stall, root=root, log=self.log)
+        self.psi_trigger_config = DEFAULT_TRIGGERS
+        self.event_loop = None
+        self.status_server = None
+        if root == "/":
+            self.status_server = StatusServer(self.get_snapshot, log=self.log)
+        self.mailbox = None
+        if root == "/":
+            try:
+                self.mailbox = Mailbox()
+            except OSError as e:
+                self.log.debug(f"VideoCore mailbox not available, use vcgencmd: {e}")
+        self.rollup = MetricRollup(DEFAULT_ROLLUP_METRICS, window=DEFAULT_ROLLUP_INTERVAL)
 
         # 初始化任务调度器和命令处理器
         self.subscribe("system/shutdown", self.handle_shutdown)
+        self.subscribe("system/shutdown/register", self.handle_shutdown_register)
+        self.subscribe("system/shutdown/unregister", self.handle_shutdown_unregister)
+        self.subscribe("system/shutdown/ack", self.handle_shutdown_ack)
+        self.subscribe("system/snapshot/get", self.handle_snapshot)
+        self.subscribe("system/refresh", self.handle_refresh)
+        self.subscribe("system/interest/subscribe", self.handle_interest_subscribe)
+        self.subscribe("system/interest/unsubscribe", self.handle_interest_unsubscribe)
+        self.subscribe("system/debug", self.handle_debug)
         
         """初始化任务调度器"""
         self.task_1s_caller = LazyCaller(self.task_1s, interval=1)
         self.task_3s_caller = LazyCaller(self.task_3s, interval=3)
         self.task_5s_caller = LazyCaller(self.task_5s, interval=5)
+        self.task_groups = {
+            "once": self.task_once,
+            "1s": self.task_1s,
+            "3s": self.task_3s,
+            "5s": self.task_5s,
+        }
+        self.last_refresh_time = {}
+        self.rollup_interval = DEFAULT_ROLLUP_INTERVAL
+        self.rollup_caller = LazyCaller(self.task_rollup, interval=self.rollup_interval)
     
     # ------------------------------
     # 命令处理器
@@ -44,29 +154,152 @@ class SystemManager(ServiceNode):
     def init_pwm_fan(self):
         if self.pwm_fan is None:
             try:
-                self.pwm_fan = PWMFan()
+                self.pwm_fan = PWMFan(log=self.log)
+                self.sample_bus.register("pwm_fan_speed", self.pwm_fan.get_speed)
+                self.sample_bus.register("pwm_fan_state", self.pwm_fan.get_state)
             except Exception as e:
                 self.log.error(f"PWM fan not supported: {str(e)}")
 
     def handle_shutdown(self, data: Dict) -> Dict:
-        """处理关机命令"""
+        """处理关机命令，异步等待参与者确认后关机"""
         reason = data.get("reason", "No reason provided")
         initiator = data.get("initiator", "unknown")
-        
-        # 发布关机前事件
+        deadline = data.get("deadline", self.shutdown_coordinator.deadline)
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or deadline < 0:
+            self.log.error(f"Invalid shutdown deadline: {deadline}, use {self.shutdown_coordinator.deadline}")
+            deadline = self.shutdown_coordinator.deadline
+
+        if self.shutdown_coordinator.in_progress:
+            self.log.warning(f"Shutdown already in progress, ignore request from {initiator}")
+            return
+
+        # 发布关机前事件，参与者完成清理后发送 system/shutdown/ack
         self.publish("system/before_shutdown", {
                 "reason": reason,
                 "initiator": initiator,
+                "deadline": deadline,
+                "participants": sorted(self.shutdown_coordinator.participants),
             }
         )
-        
-        time.sleep(5)
-        
+
+        self.shutdown_coordinator.request_threadsafe(deadline)
+
+    def handle_shutdown_register(self, data: Dict) -> None:
+        """注册关机参与者"""
+        self.shutdown_coordinator.register_threadsafe(data.get("participant", "unknown"))
+
+    def handle_shutdown_unregister(self, data: Dict) -> None:
+        """注销关机参与者"""
+        self.shutdown_coordinator.unregister_threadsafe(data.get("participant", "unknown"))
+
+    def handle_shutdown_ack(self, data: Dict) -> None:
+        """参与者确认已准备好关机"""
+        self.shutdown_coordinator.ack_threadsafe(data.get("participant", "unknown"))
+
+    def do_shutdown(self) -> None:
         try:
             shutdown()
         except Exception as e:
             self.log.error(f"Shutdown failed: {str(e)}")
 
+    def get_snapshot(self, keys=None) -> Dict:
+        """所有指标的最新缓存值及采样时间，不读取硬件"""
+        return {
+            "timestamp": time.time(),
+            "metrics": self.metric_cache.snapshot(keys),
+        }
+
+    def handle_snapshot(self, data: Dict) -> Dict:
+        """返回所有指标的最新缓存值及采样时间，不读取硬件"""
+        keys = data.get("keys") if isinstance(data, dict) else None
+        snapshot = self.get_snapshot(keys)
+        self.publish("system/snapshot", snapshot)
+        return snapshot
+
+    def handle_refresh(self, data: Dict) -> Dict:
+        """立即刷新指定任务组，每组限速，任务在事件循环中执行，不与定时采集并发"""
+        groups = data.get("groups") if isinstance(data, dict) else None
+        if groups is not None and not is_str_list(groups):
+            self.log.error(f"Invalid refresh groups: {groups}")
+            return {"refreshed": [], "skipped": []}
+        if not groups:
+            groups = list(self.task_groups)
+        refreshed = []
+        skipped = []
+        now = time.monotonic()
+        for group in groups:
+            task = self.task_groups.get(group)
+            if task is None:
+                self.log.error(f"Invalid refresh group: {group}")
+                continue
+            if now - self.last_refresh_time.get(group, -REFRESH_MIN_INTERVAL) < REFRESH_MIN_INTERVAL:
+                skipped.append(group)
+                continue
+            self.last_refresh_time[group] = now
+            refreshed.append(group)
+        for group in refreshed:
+            if self.event_loop:
+                self.event_loop.call_soon_threadsafe(self.task_groups[group])
+            else:
+                # 事件循环未启动，没有定时采集在运行
+                self.task_groups[group]()
+        return {"refreshed": refreshed, "skipped": skipped}
+
+    def handle_interest_subscribe(self, data: Dict) -> Dict:
+        """订阅指标组，客户端需在租约到期前续订"""
+        if not isinstance(data, dict):
+            self.log.error(f"Invalid interest subscribe: {data}")
+            return {"groups": self.interest.wanted_groups()}
+        client = data.get("client", "unknown")
+        groups = data.get("groups", [])
+        lease = data.get("lease")
+        if not is_str_list(groups):
+            self.log.error(f"Invalid interest groups: {groups}")
+            return {"groups": self.interest.wanted_groups()}
+        if lease is not None and (isinstance(lease, bool) or not isinstance(lease, (int, float)) or lease <= 0):
+            self.log.error(f"Invalid interest lease: {lease}")
+            return {"groups": self.interest.wanted_groups()}
+        resumed = self.interest.subscribe(client, groups, lease)
+        if resumed:
+            self.log.debug(f"Resume collecting: {resumed}")
+            if self.interest.enabled:
+                # 恢复采集后立即刷新一次，不必等下一个周期
+                self.handle_refresh({"groups": ["1s", "3s", "5s"]})
+        return {"groups": self.interest.wanted_groups()}
+
+    def handle_interest_unsubscribe(self, data: Dict) -> Dict:
+        """取消订阅指标组"""
+        if not isinstance(data, dict):
+            self.log.error(f"Invalid interest unsubscribe: {data}")
+            return {"groups": self.interest.wanted_groups()}
+        client = data.get("client", "unknown")
+        groups = data.get("groups")
+        if groups is not None and not is_str_list(groups):
+            self.log.error(f"Invalid interest groups: {groups}")
+            return {"groups": self.interest.wanted_groups()}
+        suspended = self.interest.unsubscribe(client, groups)
+        if suspended:
+            self.log.debug(f"Suspend collecting: {suspended}")
+        return {"groups": self.interest.wanted_groups()}
+
+    def handle_debug(self, data: Dict) -> Dict:
+        """调试命令：线程/协程栈、采样分析、内存分配快照"""
+        if not isinstance(data, dict):
+            self.log.error(f"Invalid debug command: {data}")
+            return {"action": None, "error": "Invalid debug command"}
+        params = dict(data)
+        action = params.pop("action", None)
+        seconds = params.get("seconds")
+        if seconds is not None and (isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or seconds <= 0):
+            self.log.error(f"Invalid debug profile seconds: {seconds}")
+            return {"action": action, "error": f"Invalid seconds: {seconds}"}
+        try:
+            path = self.debug_hooks.handle(action, **params)
+        except (OSError, ValueError) as e:
+            self.log.error(f"Debug action {action} failed: {e}")
+            return {"action": action, "error": str(e)}
+        return {"action": action, "path": path}
+
     def handle_power_button(self, status: ButtonStatus) -> None:
         """处理电源按钮事件"""
         if status == ButtonStatus.CLICK:
@@ -89,9 +322,142 @@ class SystemManager(ServiceNode):
             if config["pwm_fan_mode"] in FanMode:
                 if self.pwm_fan:
                     self.pwm_fan.set_mode(config["pwm_fan_mode"])
+                self.pwm_fan_mode = config["pwm_fan_mode"]
                 patch["pwm_fan_mode"] = config["pwm_fan_mode"]
             else:
                 self.log.error(f"Invalid PWM fan mode: {config['pwm_fan_mode']}")
+        if "on_demand_collection" in config:
+            self.interest.enabled = bool(config["on_demand_collection"])
+            patch["on_demand_collection"] = self.interest.enabled
+        if "trace_record_path" in config:
+            path = config["trace_record_path"]
+            if self.trace_recorder:
+                self.trace_recorder.close()
+                self.trace_recorder = None
+            if path:
+                try:
+                    self.trace_recorder = TraceRecorder(path)
+                except OSError as e:
+                    self.log.error(f"Open trace file {path} failed: {e}")
+            patch["trace_record_path"] = path
+        if "prometheus_port" in config or "prometheus_host" in config:
+            port = config.get("prometheus_port", self.exporter.port if self.exporter else 0)
+            host = config.get("prometheus_host", self.exporter.host if self.exporter else "0.0.0.0")
+            if self.exporter:
+                self.exporter.stop()
+                self.exporter = None
+            if port:
+                try:
+                    self.exporter = OpenMetricsExporter(host=host, port=int(port), log=self.log)
+                    self.exporter.update(self.metric_cache.snapshot_values())
+                    self.exporter.start()
+                except (OSError, ValueError) as e:
+                    self.log.error(f"Start OpenMetrics exporter on {host}:{port} failed: {e}")
+                    self.exporter = None
+            if "prometheus_port" in config:
+                patch["prometheus_port"] = port
+            if "prometheus_host" in config:
+                patch["prometheus_host"] = host
+        if "rollup_interval" in config or "rollup_window" in config or "rollup_metrics" in config:
+            interval = config.get("rollup_interval", self.rollup_interval)
+            window = config.get("rollup_window", self.rollup.window)
+            metrics = config.get("rollup_metrics", self.rollup.metrics)
+            if isinstance(interval, (int, float)) and interval >= 0 and \
+                    isinstance(window, (int, float)) and window > 0 and isinstance(metrics, list):
+                self.rollup = MetricRollup(metrics, window=window)
+                self.rollup_interval = interval
+                self.rollup_caller = LazyCaller(self.task_rollup, interval=interval) if interval else None
+                for key in ("rollup_interval", "rollup_window", "rollup_metrics"):
+                    if key in config:
+                        patch[key] = config[key]
+            else:
+                self.log.error(f"Invalid rollup config: {interval}, {window}, {metrics}")
+        if "shutdown_deadline" in config:
+            deadline = config["shutdown_deadline"]
+            if isinstance(deadline, (int, float)) and deadline >= 0:
+                self.shutdown_coordinator.deadline = deadline
+                patch["shutdown_deadline"] = deadline
+            else:
+                self.log.error(f"Invalid shutdown deadline: {deadline}")
+        if "cpu_profile_link_fan" in config:
+            self.cpu_profile_link_fan = bool(config["cpu_profile_link_fan"])
+            patch["cpu_profile_link_fan"] = self.cpu_profile_link_fan
+        if "cpu_profile" in config:
+            profile = config["cpu_profile"]
+            if profile in PROFILES:
+                self.auto_profile = None
+                self.switch_cpu_profile(profile, "config")
+                patch["cpu_profile"] = profile
+                if self.cpu_profile_link_fan and self.pwm_fan:
+                    # 明确配置时风扇模式随之持久化，同步到配置
+                    self.pwm_fan_mode = profile
+                    patch["pwm_fan_mode"] = profile
+            elif profile == AUTO:
+                self.auto_profile = AutoProfile()
+                self.switch_cpu_profile(self.auto_profile.profile, "auto")
+                patch["cpu_profile"] = profile
+            elif profile in (None, "none"):
+                # 恢复首次切换前的 CPU 频率策略，交还系统管理
+                self.auto_profile = None
+                written = self.cpu_profile.restore()
+                if written:
+                    self.log.info(f"CPU profile: none, {len(written)} settings restored")
+                if self.cpu_profile_link_fan and self.pwm_fan and self.pwm_fan_mode:
+                    self.pwm_fan.apply_trip_points(self.pwm_fan_mode)
+                patch["cpu_profile"] = "none"
+            else:
+                self.log.error(f"Invalid CPU profile: {profile}")
+        if "alert_rules" in config:
+            try:
+                self.alert_engine.load(config["alert_rules"] or [])
+                patch["alert_rules"] = config["alert_rules"]
+                # 规则依赖的组作为内部订阅，无外部订阅者时也继续采集和评估
+                groups = set()
+                for rule in self.alert_engine.rules:
+                    groups |= metric_groups(rule.metric)
+                self.interest.unsubscribe(ALERTS_CLIENT)
+                if groups:
+                    self.interest.subscribe(ALERTS_CLIENT, sorted(groups), float("inf"))
+            except (KeyError, TypeError, ValueError) as e:
+                self.log.error(f"Invalid alert rules: {e}")
+        if "disk_temperature_interval" in config:
+            interval = config["disk_temperature_interval"]
+            if isinstance(interval, (int, float)) and interval > 0:
+                self.disk_temperature.interval = interval
+                patch["disk_temperature_interval"] = interval
+            else:
+                self.log.error(f"Invalid disk temperature interval: {interval}")
+        if "psi_triggers" in config:
+            triggers = config["psi_triggers"]
+            if isinstance(triggers, list) and all(
+                    isinstance(t, dict) and {"resource", "type", "stall_ms", "window_ms"} <= set(t) for t in triggers):
+                self.psi_trigger_config = triggers
+                patch["psi_triggers"] = triggers
+                if not init and self.event_loop and "pressure" in self.peripherals:
+                    self.event_loop.call_soon_threadsafe(self.psi_triggers.start, triggers)
+            else:
+                self.log.error(f"Invalid PSI triggers: {triggers}")
+        if "cgroup_patterns" in config:
+            patterns = config["cgroup_patterns"]
+            if isinstance(patterns, list):
+                self.cgroup_collector.set_patterns(patterns)
+                patch["cgroup_patterns"] = patterns
+            else:
+                self.log.error(f"Invalid cgroup patterns: {patterns}")
+        if "debug_output_dir" in config:
+            self.debug_hooks.output_dir = config["debug_output_dir"]
+            patch["debug_output_dir"] = config["debug_output_dir"]
+        if "network_interfaces_include" in config or "network_interfaces_exclude" in config:
+            include = config.get("network_interfaces_include", self.network_collector.include)
+            exclude = config.get("network_interfaces_exclude", self.network_collector.exclude)
+            if isinstance(include, list) and isinstance(exclude, list):
+                self.network_collector.set_filter(include, exclude)
+                if "network_interfaces_include" in config:
+                    patch["network_interfaces_include"] = include
+                if "network_interfaces_exclude" in config:
+                    patch["network_interfaces_exclude"] = exclude
+            else:
+                self.log.error(f"Invalid network interface filter: {include}, {exclude}")
         return patch
 
     def on_peripherals_changed(self, peripherals: Dict[str, Any]) -> None:
@@ -101,9 +467,89 @@ class SystemManager(ServiceNode):
         if "pwm_fan" in peripherals:
             self.init_pwm_fan()
 
+    def switch_cpu_profile(self, profile: str, reason: str) -> None:
+        """切换 CPU 频率配置，可选同时切换风扇模式，并发布切换事件"""
+        written = self.cpu_profile.apply(profile)
+        if self.cpu_profile_link_fan and self.pwm_fan:
+            if reason == "config":
+                self.pwm_fan.set_mode(profile)
+            else:
+                # 自动切换只修改运行时的风扇曲线，不改写 config.txt
+                self.pwm_fan.apply_trip_points(profile)
+        self.log.info(f"CPU profile: {profile} ({reason}), {len(written)} settings changed")
+        self.publish("system/cpu_profile", {
+            "profile": profile,
+            "reason": reason,
+            "changes": [f"{policy}/{name}={value}" for policy, name, value in written],
+        })
+
+    def is_collecting(self, group: str) -> bool:
+        """外设已声明且有订阅者时才采集"""
+        return group in self.peripherals and self.interest.is_wanted(group)
+
+    def publish_data(self, data: Dict) -> None:
+        """发布数据并更新缓存"""
+        self.metric_cache.update(data)
+        if self.trace_recorder:
+            self.trace_recorder.record(data)
+        if self.exporter:
+            self.exporter.update(data)
+        self.rollup.add(data)
+        super().publish_data(data)
+        if self.alert_engine.rules:
+            firing, resolved = self.alert_engine.evaluate(data)
+            for alert in firing:
+                self.log.warning(f"Alert {alert['name']} firing: {alert['metric']} = {alert['value']}")
+                self.publish("system/alert/firing", alert)
+            for alert in resolved:
+                self.log.info(f"Alert {alert['name']} resolved: {alert['metric']} = {alert['value']}")
+                self.publish("system/alert/resolved", alert)
+
     # ------------------------------
     # 定时任务（数据采集与发布）
     # ------------------------------
+    def handle_thermal_event(self, event: Dict) -> None:
+        """内核风扇档位变化时立即发布，不等下一个周期"""
+        if event["event"] == "cdev_state" and event.get("cdev_id") == 0 and "state" in event:
+            self.sample_bus.put("pwm_fan_state", event["state"])
+            if self.pwm_fan and self.interest.is_wanted("pwm_fan"):
+                self.publish_data({"pwm_fan_state": event["state"]})
+
+    def handle_pressure_stall(self, trigger: Dict) -> None:
+        """内核 PSI 触发器报告资源阻塞，立即发布并加快一次采集"""
+        self.log.debug(f"Pressure stall: {trigger}")
+        self.publish("system/pressure_stall", {
+            **trigger,
+            "timestamp": time.time(),
+            "pressure": self.psi_collector.collect(),
+        })
+        self.handle_refresh({"groups": ["1s"]})
+
+    def read_mailbox(self) -> Dict:
+        """通过 VideoCore mailbox 批量读取固件数据，失败时返回 None"""
+        keys = []
+        tags = []
+        if self.is_collecting("gpu_temperature"):
+            keys.append("gpu_temperature")
+            tags.append((TAG_GET_TEMPERATURE, [0], 8))
+        if self.is_collecting("throttle"):
+            keys.append("throttled")
+            tags.append((TAG_GET_THROTTLED, [0xFFFF], 4))
+        try:
+            values = self.mailbox.request(tags)
+        except (OSError, MailboxError) as e:
+            self.log.error(f"Read VideoCore mailbox failed, use vcgencmd: {e}")
+            self.mailbox.close()
+            self.mailbox = None
+            return None
+        data = {}
+        for key, value in zip(keys, values):
+            if key == "gpu_temperature":
+                data[key] = Mailbox.unpack(value, 1) / 1000
+            else:
+                data[key] = Mailbox.unpack(value)
+        return data
+
     def task_once(self) -> None:
         """只执行一次的初始化任务"""
         data = {}
@@ -124,18 +570,27 @@ class SystemManager(ServiceNode):
         data = {}
         
         # 收集CPU温度
-        if "cpu_temperature" in self.peripherals:
-            cpu_temp = get_cpu_temperature()
-            data["cpu_temperature"] = float(cpu_temp) if cpu_temp else None
+        if self.is_collecting("cpu_temperature"):
+            data["cpu_temperature"] = self.sample_bus.value("cpu_temperature")
         
-        # 收集GPU温度
-        if "gpu_temperature" in self.peripherals:
-            gpu_temp = get_gpu_temperature()
-            data["gpu_temperature"] = float(gpu_temp) if gpu_temp else None
+        # 收集GPU温度和降频状态，优先通过 mailbox 一次读取，避免每秒启动 vcgencmd
+        firmware_data = None
+        if self.mailbox and (self.is_collecting("gpu_temperature") or self.is_collecting("throttle")):
+            firmware_data = self.read_mailbox()
+        if firmware_data is not None:
+            data.update(firmware_data)
+        else:
+            # mailbox 不可用或本次读取失败，同一周期内改用 vcgencmd
+            if self.is_collecting("gpu_temperature"):
+                gpu_temp = get_gpu_temperature()
+                data["gpu_temperature"] = float(gpu_temp) if gpu_temp else None
+            if self.is_collecting("throttle"):
+                data["throttled"] = vcgencmd_get_throttled()
         
         # 收集CPU使用率和频率
-        if "cpu" in self.peripherals:
-            data["cpu_percent"] = float(get_cpu_percent())
+        cpu_percent = None
+        if self.is_collecting("cpu"):
+            data["cpu_percent"] = cpu_percent = float(get_cpu_percent())
             
             for i, percent in enumerate(get_cpu_percent(percpu=True)):
                 data[f"cpu_{i}_percent"] = float(percent)
@@ -144,24 +599,43 @@ class SystemManager(ServiceNode):
             data["cpu_freq_current"] = float(cpu_freq.current)
             data["cpu_freq_min"] = float(cpu_freq.min)
             data["cpu_freq_max"] = float(cpu_freq.max)
+
+        # 根据持续负载自动切换 CPU 频率配置，不受按需采集影响
+        if self.auto_profile:
+            if cpu_percent is None:
+                cpu_percent = float(get_cpu_percent())
+            profile = self.auto_profile.update(cpu_percent)
+            if profile:
+                self.switch_cpu_profile(profile, "auto")
         
         # 收集内存信息
-        if "memory" in self.peripherals:
+        if self.is_collecting("memory"):
             memory = get_memory_info()
             data["memory_total"] = int(memory.total)
             data["memory_available"] = int(memory.available)
             data["memory_percent"] = float(memory.percent)
         
         # 收集网络速度
-        if "network" in self.peripherals:
+        if self.is_collecting("network"):
             net_speed = get_network_speed()
             data["network_upload"] = int(net_speed.upload)
             data["network_download"] = int(net_speed.download)
+            # 各网卡速率、错误和丢包
+            data.update(self.network_collector.collect())
+        else:
+            # 暂停期间不保留上次计数，恢复后的首个速率不跨越整个暂停期
+            self.network_collector.reset()
         
+        # 收集资源压力（PSI）
+        if self.is_collecting("pressure"):
+            data.update(self.psi_collector.collect())
+
         # PWM风扇
-        if self.pwm_fan:
-            data["pwm_fan_speed"] = self.pwm_fan.get_speed()
-            data["pwm_fan_state"] = self.pwm_fan.get_state()
+        if self.pwm_fan and self.interest.is_wanted("pwm_fan"):
+            data["pwm_fan_speed"] = self.sample_bus.value("pwm_fan_speed")
+            # 有内核事件时档位变化会立即发布，无需每秒读取
+            if not (self.thermal_events and self.thermal_events.is_event_driven):
+                data["pwm_fan_state"] = self.sample_bus.value("pwm_fan_state")
 
         # 发布数据
         self.publish_data(data)
@@ -171,14 +645,14 @@ class SystemManager(ServiceNode):
         data = {}
         
         # 收集IP地址
-        if "ip_address" in self.peripherals:
+        if self.is_collecting("ip_address"):
             ips = get_ips()
             data["ips"] = ips
             for name, addr in ips.items():
                 data[f"ip_{name}"] = addr
         
         # 收集网络连接类型
-        if "network" in self.peripherals:
+        if self.is_collecting("network"):
             net_type = get_network_connection_type()
             data["network_type"] = "&".join(net_type)
         
@@ -193,9 +667,10 @@ class SystemManager(ServiceNode):
         data["boot_time"] = float(get_boot_time())
         
         # 收集存储信息
-        if 'storage' in self.peripherals:
+        if self.is_collecting("storage"):
             data['disk_list'] = get_disks()
-            disks = get_disks_info(temperature=True)
+            # 温度由独立的引擎按较慢的周期并发读取，不在此处启动外部工具
+            disks = get_disks_info(temperature=False)
             # data['disks'] = disks
             for disk_name in disks:
                 disk = disks[disk_name]
@@ -204,26 +679,79 @@ class SystemManager(ServiceNode):
                 data[f'disk_{disk_name}_used'] = int(disk.used)
                 data[f'disk_{disk_name}_free'] = int(disk.free)
                 data[f'disk_{disk_name}_percent'] = float(disk.percent)
+            self.disk_temperature.update(list(disks))
+            for disk_name, result in self.disk_temperature.results().items():
+                data[f'disk_{disk_name}_temperature'] = result["temperature"]
+                data[f'disk_{disk_name}_temperature_age'] = result["age"]
+                data[f'disk_{disk_name}_standby'] = int(result["standby"])
+                data[f'disk_{disk_name}_temperature_stale'] = int(result["stale"])
+
+        # 收集容器和服务的 cgroup 资源占用
+        if self.is_collecting("cgroups"):
+            data.update(self.cgroup_collector.collect())
+        else:
+            self.cgroup_collector.reset()
         
         # 发布数据
         self.publish_data(data)
     
+    def task_rollup(self) -> None:
+        """按配置周期发布滑动窗口统计（最小/最大/均值/分位数）"""
+        data = self.rollup.rollup()
+        if data:
+            self.publish("system/rollup", data)
+
     # ------------------------------
     # 节点运行与生命周期管理
     # ------------------------------
 
     def on_start(self) -> None:
+        self.debug_hooks.install()
+        if self.status_server:
+            try:
+                self.status_server.start()
+            except OSError as e:
+                self.log.warning(f"Status socket {self.status_server.path} not available: {e}")
+                self.status_server = None
         self.task_once()
 
     def on_stop(self) -> None:
         if self.power_button:
             self.power_button.stop()
+        self.network_collector.close()
+        if self.mailbox:
+            self.mailbox.close()
+        if self.thermal_events:
+            self.thermal_events.stop()
+        self.cgroup_collector.close()
+        self.disk_temperature.close()
+        self.psi_triggers.stop()
+        self.psi_collector.close()
+        if self.status_server:
+            self.status_server.stop()
+        if self.trace_recorder:
+            self.trace_recorder.close()
+        if self.exporter:
+            self.exporter.stop()
 
     async def main(self) -> None:
+        self.event_loop = asyncio.get_running_loop()
+        self.shutdown_coordinator.start(self.event_loop)
+        self.debug_hooks.loop = self.event_loop
+        if self.pwm_fan and self.root == "/":
+            # 无 netlink 时通过共享采样轮询档位，与风扇控制共用一次读取
+            self.thermal_events = ThermalEventSource(
+                self.handle_thermal_event,
+                read_state=lambda: self.sample_bus.value("pwm_fan_state"), log=self.log)
+            asyncio.ensure_future(self.thermal_events.run())
+        if "pressure" in self.peripherals:
+            self.psi_triggers.start(self.psi_trigger_config)
         # 执行定时任务
         while True:
             self.task_1s_caller()
             self.task_3s_caller()
             self.task_5s_caller()
+            if self.rollup_caller:
+                self.rollup_caller()
             await self.sleep(1)
 
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import socket
+import struct
+
+NETLINK_GENERIC = 16
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+
+NLMSG_HDR = struct.Struct('=IHHII')
+GENLMSG_HDR = struct.Struct('=BBH')
+NLATTR_HDR = struct.Struct('=HH')
+NLM_F_REQUEST = 0x1
+NLMSG_ERROR = 0x2
+NLA_TYPE_MASK = 0x3FFF
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+# include/uapi/linux/thermal.h
+THERMAL_GENL_FAMILY_NAME = 'thermal'
+THERMAL_GENL_EVENT_GROUP_NAME = 'event'
+THERMAL_GENL_ATTR_TZ_ID = 2
+THERMAL_GENL_ATTR_TZ_TEMP = 3
+THERMAL_GENL_ATTR_TZ_TRIP_ID = 5
+THERMAL_GENL_ATTR_CDEV_ID = 15
+THERMAL_GENL_ATTR_CDEV_CUR_STATE = 16
+THERMAL_GENL_EVENT_TZ_TRIP_UP = 5
+THERMAL_GENL_EVENT_TZ_TRIP_DOWN = 6
+THERMAL_GENL_EVENT_CDEV_STATE_UPDATE = 12
+
+EVENT_NAMES = {
+    THERMAL_GENL_EVENT_TZ_TRIP_UP: 'trip_up',
+    THERMAL_GENL_EVENT_TZ_TRIP_DOWN: 'trip_down',
+    THERMAL_GENL_EVENT_CDEV_STATE_UPDATE: 'cdev_state',
+}
+
+ATTR_NAMES = {
+    THERMAL_GENL_ATTR_TZ_ID: 'tz_id',
+    THERMAL_GENL_ATTR_TZ_TEMP: 'temperature',
+    THERMAL_GENL_ATTR_TZ_TRIP_ID: 'trip_id',
+    THERMAL_GENL_ATTR_CDEV_ID: 'cdev_id',
+    THERMAL_GENL_ATTR_CDEV_CUR_STATE: 'state',
+}
+
+COOLING_DEVICE_STATE = '/sys/class/thermal/cooling_device0/cur_state'
+
+def parse_attrs(data):
+    """
+    Parse netlink attributes
+
+    Returns:
+        dict: {attribute type: payload bytes}
+    """
+    attrs = {}
+    offset = 0
+    while offset + NLATTR_HDR.size <= len(data):
+        length, attr_type = NLATTR_HDR.unpack_from(data, offset)
+        if length < NLATTR_HDR.size:
+            break
+        attrs[attr_type & NLA_TYPE_MASK] = data[offset + NLATTR_HDR.size:offset + length]
+        offset += (length + 3) & ~3
+    return attrs
+
+def pack_attr(attr_type, payload):
+    length = NLATTR_HDR.size + len(payload)
+    return NLATTR_HDR.pack(length, attr_type) + payload + b'\0' * (((length + 3) & ~3) - length)
+
+def parse_messages(data):
+    """
+    Split a netlink datagram into (message type, generic netlink command, attributes)
+    """
+    offset = 0
+    while offset + NLMSG_HDR.size <= len(data):
+        length, msg_type, _, _, _ = NLMSG_HDR.unpack_from(data, offset)
+        if length < NLMSG_HDR.size:
+            break
+        payload = data[offset + NLMSG_HDR.size:offset + length]
+        if msg_type == NLMSG_ERROR:
+            error, = struct.unpack_from('=i', payload)
+            if error:
+                raise OSError(-error, os.strerror(-error))
+        elif len(payload) >= GENLMSG_HDR.size:
+            cmd, _, _ = GENLMSG_HDR.unpack_from(payload)
+            yield msg_type, cmd, parse_attrs(payload[GENLMSG_HDR.size:])
+        offset += (length + 3) & ~3
+
+def open_thermal_socket():
+    """
+    Open a generic netlink socket subscribed to thermal events
+
+    Raises:
+        OSError: if thermal netlink is not available
+    """
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+    try:
+        sock.bind((0, 0))
+        request = GENLMSG_HDR.pack(CTRL_CMD_GETFAMILY, 1, 0) + \
+            pack_attr(CTRL_ATTR_FAMILY_NAME, THERMAL_GENL_FAMILY_NAME.encode() + b'\0')
+        sock.send(NLMSG_HDR.pack(NLMSG_HDR.size + len(request), GENL_ID_CTRL, NLM_F_REQUEST, 1, 0) + request)
+
+        group_id = None
+        for _, _, attrs in parse_messages(sock.recv(65536)):
+            groups = parse_attrs(attrs.get(CTRL_ATTR_MCAST_GROUPS, b''))
+            for group in groups.values():
+                group_attrs = parse_attrs(group)
+                name = group_attrs.get(CTRL_ATTR_MCAST_GRP_NAME, b'').rstrip(b'\0').decode()
+                if name == THERMAL_GENL_EVENT_GROUP_NAME:
+                    group_id, = struct.unpack('=I', group_attrs[CTRL_ATTR_MCAST_GRP_ID])
+        if group_id is None:
+            raise OSError(f'thermal netlink group "{THERMAL_GENL_EVENT_GROUP_NAME}" not found')
+        sock.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, group_id)
+        sock.setblocking(False)
+        return sock
+    except OSError:
+        sock.close()
+        raise
+
+def decode_event(cmd, attrs):
+    """
+    Convert a thermal netlink event to a dict, None for events not handled
+    """
+    name = EVENT_NAMES.get(cmd)
+    if name is None:
+        return None
+    event = {"event": name}
+    for attr_type, key in ATTR_NAMES.items():
+        if attr_type in attrs and len(attrs[attr_type]) >= 4:
+            event[key], = struct.unpack_from('=i', attrs[attr_type])
+    return event
+
+class ThermalEventSource():
+    """
+    Kernel thermal events, trip point crossings and cooling device state changes
+
+    Listens to thermal netlink, falls back to polling the cooling device
+    state when netlink is not available. callback(event) is called on the
+    event loop with dicts like {"event": "cdev_state", "cdev_id": 0, "state": 2}.
+
+    Args:
+        read_state (callable): Reads the cooling device state when polling,
+            e.g. through a SampleBus so pollers share one read per tick.
+            Reads cooling_device directly if None
+    """
+
+    def __init__(self, callback, poll_interval=1, cooling_device=COOLING_DEVICE_STATE, read_state=None, log=None):
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.cooling_device = cooling_device
+        self.read_state = read_state or self._read_cooling_device
+        self.log = log
+        self.sock = None
+        self._stopped = None
+
+    @property
+    def is_event_driven(self):
+        return self.sock is not None
+
+    async def run(self):
+        self._stopped = asyncio.Event()
+        try:
+            self.sock = open_thermal_socket()
+        except OSError as e:
+            if self.log:
+                self.log.info(f"Thermal netlink not available, poll {self.cooling_device}: {e}")
+            await self._poll()
+            return
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+        try:
+            await self._stopped.wait()
+        finally:
+            loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+
+    def _on_readable(self):
+        try:
+            data = self.sock.recv(65536)
+            for _, cmd, attrs in parse_messages(data):
+                event = decode_event(cmd, attrs)
+                if event is not None:
+                    self.callback(event)
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            # ENOBUFS when events overflowed, the next event resyncs anyway
+            if self.log:
+                self.log.warning(f"Read thermal netlink error: {e}")
+
+    def _read_cooling_device(self):
+        try:
+            with open(self.cooling_device, 'r') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    async def _poll(self):
+        last = None
+        while not self._stopped.is_set():
+            state = self.read_state()
+            if state is not None and state != last:
+                if last is not None:
+                    self.callback({"event": "cdev_state", "cdev_id": 0, "state": state})
+                last = state
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self):
+        if self._stopped is not None:
+            self._stopped.set()
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+
+class TraceRecorder():
+    """
+    Record published data to a JSON lines trace file
+
+    Each line is {"session": wall clock start of the recording, "time":
+    seconds since recording started, "data": {...}}. Recordings are appended,
+    the session tells them apart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+        self._start = time.monotonic()
+        self._session = round(time.time(), 3)
+
+    def record(self, data):
+        line = json.dumps({"session": self._session, "time": round(time.monotonic() - self._start, 3), "data": data})
+        self._file.write(line + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def load_trace(path):
+    """
+    Load a trace file recorded by TraceRecorder
+
+    Sessions are played one after another in the order they were recorded.
+
+    Returns:
+        list: [(time, data), ...] sorted by time
+    """
+    sessions = {}
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            sessions.setdefault(entry.get("session"), []).append((float(entry["time"]), entry["data"]))
+    entries = []
+    for session in sessions.values():
+        session.sort(key=lambda entry: entry[0])
+        offset = entries[-1][0] if entries else 0
+        entries.extend((offset + entry_time, data) for entry_time, data in session)
+    return entries
+
+class TraceReplayer():
+    """
+    Replay a recorded trace at a given speed
+
+    Args:
+        entries (list): Trace entries from load_trace, can be shared between replayers
+        speed (float): Replay speed, 1 for real time, 100 for 100x faster
+        offset (int): Index of the first entry to play, to desynchronise nodes sharing a trace
+        loop (bool): Start over when the trace ends
+    """
+
+    def __init__(self, entries, speed=1, offset=0, loop=True):
+        if speed <= 0:
+            raise ValueError(f"Invalid replay speed: {speed}")
+        self.entries = entries
+        self.speed = speed
+        self.offset = offset % len(entries) if entries else 0
+        self.loop = loop
+
+    async def play(self, callback):
+        """
+        Call callback(data) for every entry, sleeping between entries as recorded
+        """
+        if not self.entries:
+            return
+        index = self.offset
+        while True:
+            last_time = self.entries[index][0]
+            for entry_time, data in self.entries[index:]:
+                await asyncio.sleep(max(0, entry_time - last_time) / self.speed)
+                last_time = entry_time
+                callback(data)
+            if not self.loop:
+                break
+            index = 0